@@ -230,7 +230,12 @@ st.markdown("---")
 
 # 데이터 갱신 버튼
 if st.button("🔄 데이터 캐시 초기화 (새로고침)", type="primary", use_container_width=True):
+    from utils.data_fetcher import clear_latest_business_day
+    from utils.supabase_client import clear_supabase_caches, reset_supabase_client
     st.cache_data.clear()
+    clear_supabase_caches()  # 최신 리포트 stale-while-revalidate 캐시
+    clear_latest_business_day()  # 세션 메모 (data_fetcher.get_latest_business_day)
+    reset_supabase_client()  # 연결 실패 상태였다면 다음 조회에서 바로 재연결
     st.rerun()
 
 st.markdown("---")
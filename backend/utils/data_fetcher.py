@@ -1,3 +1,4 @@
+import concurrent.futures
 import pandas as pd
 from pykrx import stock
 import FinanceDataReader as fdr
@@ -13,6 +14,11 @@ def _now_kst():
     return datetime.now(KST)
 
 
+def _nonempty(df, cols=()):
+    """df가 None이 아니고 행이 있으며 cols 컬럼을 모두 가졌는지"""
+    return df is not None and not df.empty and all(c in df.columns for c in cols)
+
+
 def get_ticker_mapping():
     """종목코드 -> 종목명, 업종 매핑"""
     try:
@@ -48,25 +54,21 @@ def get_latest_business_day():
     elif date.weekday() == 6:
         date -= timedelta(days=2)
     
-    for _ in range(7):
-        str_date = date.strftime("%Y%m%d")
-        try:
-            df = stock.get_index_ohlcv(str_date, str_date, "1001")
-            if df is not None and not df.empty:
-                return str_date
-        except:
-            pass
-        try:
-            fdr_date = date.strftime("%Y-%m-%d")
-            df = fdr.DataReader("KS11", fdr_date, fdr_date)
-            if df is not None and not df.empty:
-                return str_date
-        except:
-            pass
-        date -= timedelta(days=1)
-        while date.weekday() >= 5:
-            date -= timedelta(days=1)
-        
+    # 최근 10일 구간을 한 번에 조회해 마지막 거래일 선택
+    start = date - timedelta(days=10)
+    try:
+        df = stock.get_index_ohlcv(start.strftime("%Y%m%d"), date.strftime("%Y%m%d"), "1001")
+        if df is not None and not df.empty:
+            return df.index.max().strftime("%Y%m%d")
+    except:
+        pass
+    try:
+        df = fdr.DataReader("KS11", start.strftime("%Y-%m-%d"), date.strftime("%Y-%m-%d"))
+        if df is not None and not df.empty:
+            return df.index.max().strftime("%Y%m%d")
+    except:
+        pass
+
     date = _now_kst() - timedelta(days=1)
     while date.weekday() >= 5:
         date -= timedelta(days=1)
@@ -91,13 +93,10 @@ def get_kospi_chart_data(days=60):
         end_fdr = now.strftime("%Y-%m-%d")
         df = fdr.DataReader("KS11", start_fdr, end_fdr)
         if df is not None and not df.empty:
-            df = df.rename(columns={
+            return df.rename(columns={
                 'Open': '시가', 'High': '고가', 'Low': '저가',
                 'Close': '종가', 'Volume': '거래량'
-            })
-            if '등락률' not in df.columns and '종가' in df.columns:
-                df['등락률'] = df['종가'].pct_change() * 100
-            return df
+            }).assign(등락률=lambda d: d['종가'].pct_change().mul(100))
     except:
         pass
     
@@ -116,29 +115,47 @@ def get_exchange_rate_data(symbol="USD/KRW", days=60):
         return pd.DataFrame()
 
 
-def get_market_net_purchases(date, market="KOSPI", investor="외국인", top_n=30):
-    """순매수/순매도 데이터"""
+def _get_ohlcv_with_sector(date, market="KOSPI"):
+    """전종목 등락률 + 업종 (index=티커) — 투자자 구분과 무관한 부분"""
+    frames = []
+    try:
+        df_ohlcv = stock.get_market_ohlcv(date, market=market)
+        if _nonempty(df_ohlcv, ('등락률',)):
+            frames.append(df_ohlcv[['등락률']])
+    except:
+        pass
+
+    mapping = get_ticker_mapping()
+    if _nonempty(mapping):
+        frames.append(mapping[['Sector']] if 'Sector' in mapping.columns else pd.DataFrame({'Sector': ""}, index=mapping.index))
+
+    if not frames:
+        return pd.DataFrame()
+    merged = frames[0]
+    for frame in frames[1:]:
+        merged = merged.join(frame, how='outer')
+    return merged
+
+
+def get_market_net_purchases(date, market="KOSPI", investor="외국인", top_n=30, extra=None):
+    """순매수/순매도 데이터
+
+    extra: _get_ohlcv_with_sector 결과 — 여러 투자자를 연달아 조회할 때 한 번만 만들어 넘김
+    """
     try:
         df = stock.get_market_net_purchases_of_equities(date, date, market, investor)
-        if df is None or df.empty:
+        if not _nonempty(df):
             return pd.DataFrame()
         df = df.sort_values(by="순매수거래대금", ascending=False)
         
-        try:
-            df_ohlcv = stock.get_market_ohlcv(date, market=market)
-            if df_ohlcv is not None and not df_ohlcv.empty and '등락률' in df_ohlcv.columns:
-                df = df.join(df_ohlcv[['등락률']], how='left')
-            else:
-                df['등락률'] = 0.0
-        except:
+        if extra is None:
+            extra = _get_ohlcv_with_sector(date, market)
+        missing = [c for c in extra.columns if c not in df.columns]
+        if missing:
+            df = df.join(extra[missing], how='left')
+        if '등락률' not in df.columns:
             df['등락률'] = 0.0
-        
-        mapping = get_ticker_mapping()
-        if mapping is not None and not mapping.empty:
-            if 'Sector' not in mapping.columns:
-                mapping['Sector'] = ""
-            df = df.join(mapping[['Sector']], how='left')
-        else:
+        if 'Sector' not in df.columns:
             df['Sector'] = ""
         
         cols = ['종목명', 'Sector', '순매수거래대금', '등락률']
@@ -155,22 +172,39 @@ def get_market_net_purchases(date, market="KOSPI", investor="외국인", top_n=3
         return pd.DataFrame()
 
 
+def get_market_net_purchases_multi(date, market="KOSPI", investors=("외국인", "기관합계", "개인"), top_n=None):
+    """여러 투자자의 순매수 데이터를 한 번에 조회 → {투자자: DataFrame}"""
+    # 등락률/업종 조회+join은 투자자와 무관하므로 한 번만
+    extra = _get_ohlcv_with_sector(date, market)
+    # 투자자별 조회는 서로 독립적인 네트워크 대기 → 동시에 요청
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(investors)) as executor:
+        futures = {
+            inv: executor.submit(get_market_net_purchases, date, market, inv, top_n=top_n, extra=extra)
+            for inv in investors
+        }
+        return {inv: fut.result() for inv, fut in futures.items()}
+
+
 def get_leading_sectors(date, market="KOSPI", top_n=5):
     """수급 주도 섹터"""
     try:
-        df_foreign = get_market_net_purchases(date, market, "외국인", top_n=None)
-        top_foreign = set()
-        if not df_foreign.empty and 'Sector' in df_foreign.columns:
-            s = df_foreign.groupby('Sector')['순매수거래대금'].sum().sort_values(ascending=False)
-            top_foreign = set(s.head(top_n).index)
-            
-        df_inst = get_market_net_purchases(date, market, "기관합계", top_n=None)
-        top_inst = set()
-        if not df_inst.empty and 'Sector' in df_inst.columns:
-            s = df_inst.groupby('Sector')['순매수거래대금'].sum().sort_values(ascending=False)
-            top_inst = set(s.head(top_n).index)
-            
-        return (top_foreign | top_inst) - {''}
+        flows = get_market_net_purchases_multi(date, market, ("외국인", "기관합계"))
+        df_foreign = flows["외국인"]
+        df_inst = flows["기관합계"]
+
+        # 외국인/기관 섹터별 순매수 합계를 투자자 키를 붙여 한 번의 groupby로 집계 후 각각 상위 top_n
+        frames = {
+            inv: df[['Sector', '순매수거래대금']]
+            for inv, df in (("외국인", df_foreign), ("기관합계", df_inst))
+            if _nonempty(df, ('Sector',))
+        }
+        if not frames:
+            return set()
+        sums = pd.concat(frames, names=['inv']).groupby(['inv', 'Sector'])['순매수거래대금'].sum()
+        leading_sectors = set()
+        for inv in frames:
+            leading_sectors |= set(sums.loc[inv].nlargest(top_n).index)
+        return leading_sectors - {''}
     except:
         return set()
 
@@ -178,19 +212,21 @@ def get_leading_sectors(date, market="KOSPI", top_n=5):
 def get_global_indices(days=5):
     """글로벌 지수"""
     indices = {"NASDAQ": "IXIC", "S&P500": "US500", "SOX": "SOXX"}
-    result = {}
     now = _now_kst()
     end_date = now.strftime("%Y-%m-%d")
     start_date = (now - timedelta(days=days)).strftime("%Y-%m-%d")
-    
-    for name, symbol in indices.items():
+
+    def _fetch(symbol):
         try:
             df = fdr.DataReader(symbol, start_date, end_date)
-            if df is not None and not df.empty:
-                result[name] = df
-        except:
-            continue
-    return result
+        except Exception:
+            return None
+        return df if df is not None and not df.empty else None
+
+    # 지수별 요청을 동시에 보냄 (결과 순서는 indices 순서 유지)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(indices)) as executor:
+        frames = list(executor.map(_fetch, indices.values()))
+    return {name: df for name, df in zip(indices, frames) if df is not None}
 
 
 def get_sector_returns(date, market="KOSPI"):
@@ -199,12 +235,11 @@ def get_sector_returns(date, market="KOSPI"):
         df_price = stock.get_market_ohlcv(date, market=market)
         df_map = get_ticker_mapping()
         
-        if df_price is None or df_price.empty or df_map is None or df_map.empty:
-            return pd.Series(dtype=float)
-        if '등락률' not in df_price.columns:
+        if not _nonempty(df_price, ('등락률',)) or not _nonempty(df_map, ('Sector',)):
             return pd.Series(dtype=float)
             
-        df_merged = df_price.join(df_map[['Sector']], how='inner')
+        # 집계에 필요한 등락률/업종 한 컬럼씩만 join
+        df_merged = df_price[['등락률']].join(df_map[['Sector']], how='inner')
         sector_ret = df_merged.groupby('Sector')['등락률'].mean().sort_values(ascending=False)
         
         if '' in sector_ret.index:
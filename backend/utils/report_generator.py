@@ -1,12 +1,31 @@
 import pandas as pd
 from datetime import datetime
+import contextlib
 import os
+import tempfile
 from utils.data_fetcher import (
     get_kospi_chart_data, get_exchange_rate_data,
-    get_market_net_purchases, get_leading_sectors,
+    get_market_net_purchases_multi, get_leading_sectors,
     get_global_indices, get_sector_returns
 )
 
+# 서버리스(Vercel/Lambda)는 /tmp 외 파일시스템이 읽기 전용 → 로컬 저장 시도 자체를 생략
+_IS_SERVERLESS = bool(os.environ.get("VERCEL") or os.environ.get("AWS_LAMBDA_FUNCTION_NAME"))
+
+
+def _write_report_file(filename, report):
+    """임시 파일에 쓴 뒤 os.replace로 교체 (중간에 실패해도 반쯤 쓰인 파일이 남지 않음)"""
+    fd, tmp = tempfile.mkstemp(suffix=".md", dir=os.path.dirname(filename) or ".")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(report)
+        os.chmod(tmp, 0o644)  # mkstemp 기본 권한(0600) 대신 일반 파일 권한
+        os.replace(tmp, filename)
+    except BaseException:
+        with contextlib.suppress(OSError):  # 정리 실패가 원래 쓰기 오류를 가리지 않도록
+            os.unlink(tmp)
+        raise
+
 
 def _safe_index_str(df, idx, col, default="N/A"):
     """DataFrame에서 안전하게 값 추출"""
@@ -20,14 +39,22 @@ def _safe_index_str(df, idx, col, default="N/A"):
 
 
 def _calc_change(df, col='Close'):
-    """DataFrame의 마지막 2행으로 변동 계산"""
+    """DataFrame의 마지막 2행으로 변동 계산 → (현재값, 등락률%, 부호, 변동폭)"""
     if df is None or len(df) < 2:
-        return 0, 0, "-"
-    val = df[col].iloc[-1]
-    prev = df[col].iloc[-2]
-    chg = (val - prev) / prev * 100
+        return 0, 0, "-", 0
+    prev, val = df[col].to_numpy()[-2:]
+    delta = val - prev
+    chg = delta / prev * 100 if prev else 0.0
     sign = "▲" if chg > 0 else "▼" if chg < 0 else "-"
-    return val, chg, sign
+    return val, chg, sign, delta
+
+
+def _sector_groups(df):
+    """섹터별 {섹터: 종목 DataFrame}과 섹터별 순매수(억) 합계 — 섹터 루프에서 전체 스캔 대신 조회용"""
+    if df.empty or 'Sector' not in df.columns:
+        return {}, pd.Series(dtype=float)
+    grouped = df.groupby('Sector')
+    return dict(iter(grouped)), grouped['순매수(억)'].sum()
 
 
 def generate_topdown_report(target_date):
@@ -42,40 +69,36 @@ def generate_topdown_report(target_date):
         
         # KOSPI
         df_kospi = get_kospi_chart_data(days=10)
-        kospi_val, kospi_chg, kospi_sign = _calc_change(df_kospi, '종가')
+        kospi_val, kospi_chg, kospi_sign, _ = _calc_change(df_kospi, '종가')
         
         # 환율
         try:
             df_ex = get_exchange_rate_data(days=10)
-            ex_val, ex_chg_pct, ex_sign = _calc_change(df_ex, 'Close')
-            ex_delta = df_ex['Close'].iloc[-1] - df_ex['Close'].iloc[-2]
+            ex_val, ex_chg_pct, ex_sign, ex_delta = _calc_change(df_ex, 'Close')
         except:
             ex_val, ex_chg_pct, ex_sign, ex_delta = 0, 0, "-", 0
         
         # 글로벌 지수
         global_idx = get_global_indices(days=10)
         
-        nasdaq_val, nasdaq_chg, nasdaq_sign = 0, 0, "-"
-        sox_val, sox_chg, sox_sign = 0, 0, "-"
-        
-        if "NASDAQ" in global_idx and len(global_idx["NASDAQ"]) >= 2:
-            nasdaq_val, nasdaq_chg, nasdaq_sign = _calc_change(global_idx["NASDAQ"])
-        if "SOX" in global_idx and len(global_idx["SOX"]) >= 2:
-            sox_val, sox_chg, sox_sign = _calc_change(global_idx["SOX"])
+        # 데이터가 없거나 2행 미만이면 _calc_change가 (0, 0, "-", 0) 반환
+        nasdaq_val, nasdaq_chg, nasdaq_sign, _ = _calc_change(global_idx.get("NASDAQ"))
+        sox_val, sox_chg, sox_sign, _ = _calc_change(global_idx.get("SOX"))
         
         # 수급 (전체)
-        df_foreign_all = get_market_net_purchases(target_date, investor="외국인", top_n=None)
-        df_inst_all = get_market_net_purchases(target_date, investor="기관합계", top_n=None)
-        df_indi_all = get_market_net_purchases(target_date, investor="개인", top_n=None)
+        flows = get_market_net_purchases_multi(target_date)
+        df_foreign_all = flows["외국인"]
+        df_inst_all = flows["기관합계"]
+        df_indi_all = flows["개인"]
         
         foreign_total = df_foreign_all['순매수(억)'].sum() if not df_foreign_all.empty else 0
         inst_total = df_inst_all['순매수(억)'].sum() if not df_inst_all.empty else 0
         indi_total = df_indi_all['순매수(억)'].sum() if not df_indi_all.empty else 0
         
-        # 수급 상위/하위
-        df_foreign_buy = df_foreign_all.sort_values('순매수(억)', ascending=False).head(10) if not df_foreign_all.empty else pd.DataFrame()
-        df_inst_buy = df_inst_all.sort_values('순매수(억)', ascending=False).head(10) if not df_inst_all.empty else pd.DataFrame()
-        df_foreign_sell = df_foreign_all.sort_values('순매수(억)', ascending=True).head(5) if not df_foreign_all.empty else pd.DataFrame()
+        # 수급 상위/하위 (전체 정렬 없이 상위/하위 k개만 선택)
+        df_foreign_buy = df_foreign_all.nlargest(10, '순매수(억)') if not df_foreign_all.empty else pd.DataFrame()
+        df_inst_buy = df_inst_all.nlargest(10, '순매수(억)') if not df_inst_all.empty else pd.DataFrame()
+        df_foreign_sell = df_foreign_all.nsmallest(5, '순매수(억)') if not df_foreign_all.empty else pd.DataFrame()
         
         # 섹터 등락률
         sector_returns = get_sector_returns(target_date)
@@ -86,19 +109,24 @@ def generate_topdown_report(target_date):
         leading_set = get_leading_sectors(target_date)
         leading_list = list(leading_set)[:3]
         
+        # 섹터별 종목 그룹 / 순매수 합계는 한 번만 계산 (이하 섹터 루프는 dict·Series 조회)
+        f_groups, f_sector_sum = _sector_groups(df_foreign_all)
+        i_groups, i_sector_sum = _sector_groups(df_inst_all)
+        no_rows = df_foreign_all.iloc[:0]
+
         # 섹터별 수급 집중도 (외국인/기관 각각의 섹터별 합산)
         foreign_sector_flow = ""
         inst_sector_flow = ""
         foreign_sell_sector_flow = ""
         
         if not df_foreign_all.empty and 'Sector' in df_foreign_all.columns:
-            fs = df_foreign_all.groupby('Sector')['순매수(억)'].sum().sort_values(ascending=False)
+            fs = f_sector_sum.sort_values(ascending=False)
             fs = fs[fs.index != '']
             top_fs = fs.head(3)
             # 각 섹터의 대표 종목 1개씩 매칭
             foreign_picks = []
             for sec in top_fs.index:
-                sub = df_foreign_all[df_foreign_all['Sector'] == sec].head(1)
+                sub = f_groups.get(sec, no_rows).head(1)
                 if not sub.empty:
                     foreign_picks.append(f"{sec}({sub.iloc[0]['종목명']})")
                 else:
@@ -106,10 +134,10 @@ def generate_topdown_report(target_date):
             foreign_sector_flow = ", ".join(foreign_picks)
             
             # 외국인 순매도 섹터
-            bottom_fs = fs[fs < 0].sort_values().head(3)
+            bottom_fs = fs[fs < 0].nsmallest(3)
             sell_picks = []
             for sec in bottom_fs.index:
-                sub = df_foreign_all[df_foreign_all['Sector'] == sec].sort_values('순매수(억)').head(1)
+                sub = f_groups.get(sec, no_rows).nsmallest(1, '순매수(억)')
                 if not sub.empty:
                     sell_picks.append(f"{sec}({sub.iloc[0]['종목명']})")
                 else:
@@ -117,12 +145,12 @@ def generate_topdown_report(target_date):
             foreign_sell_sector_flow = ", ".join(sell_picks) if sell_picks else "없음"
                 
         if not df_inst_all.empty and 'Sector' in df_inst_all.columns:
-            is_ = df_inst_all.groupby('Sector')['순매수(억)'].sum().sort_values(ascending=False)
+            is_ = i_sector_sum.sort_values(ascending=False)
             is_ = is_[is_.index != '']
             top_is = is_.head(3)
             inst_picks = []
             for sec in top_is.index:
-                sub = df_inst_all[df_inst_all['Sector'] == sec].head(1)
+                sub = i_groups.get(sec, no_rows).head(1)
                 if not sub.empty:
                     inst_picks.append(f"{sec}({sub.iloc[0]['종목명']})")
                 else:
@@ -155,7 +183,9 @@ def generate_topdown_report(target_date):
             market_tone = "약세"
             market_desc = f"KOSPI가 전일 대비 {abs(kospi_chg):.2f}% 하락하며 조정 국면에 진입했습니다."
         
-        report = f"""# 📊 KOSPI Top-Down 시장 분석 보고서
+        # 리포트 조각은 리스트에 모아 마지막에 한 번만 join (문자열 += 반복 재할당 방지)
+        parts = []
+        parts.append(f"""# 📊 KOSPI Top-Down 시장 분석 보고서
 
 **작성일: {date_str}** | **기준일: {target_date}** | **KOSPI {kospi_val:,.0f}pt**
 
@@ -163,21 +193,21 @@ def generate_topdown_report(target_date):
 
 ## Executive Summary
 
-{market_desc} """
+{market_desc} """)
 
         if foreign_total > 0 and inst_total > 0:
-            report += f"외국인({foreign_total:+,.0f}억)과 기관({inst_total:+,.0f}억)이 동반 순매수하며 수급이 우호적입니다. "
+            parts.append(f"외국인({foreign_total:+,.0f}억)과 기관({inst_total:+,.0f}억)이 동반 순매수하며 수급이 우호적입니다. ")
         elif foreign_total > 0:
-            report += f"외국인이 {foreign_total:+,.0f}억원 순매수를 기록한 반면, 기관은 {inst_total:+,.0f}억원으로 소극적입니다. "
+            parts.append(f"외국인이 {foreign_total:+,.0f}억원 순매수를 기록한 반면, 기관은 {inst_total:+,.0f}억원으로 소극적입니다. ")
         elif inst_total > 0:
-            report += f"기관이 {inst_total:+,.0f}억원 순매수를 기록한 반면, 외국인은 {foreign_total:+,.0f}억원으로 관망세입니다. "
+            parts.append(f"기관이 {inst_total:+,.0f}억원 순매수를 기록한 반면, 외국인은 {foreign_total:+,.0f}억원으로 관망세입니다. ")
         else:
-            report += f"외국인({foreign_total:+,.0f}억)과 기관({inst_total:+,.0f}억) 모두 순매도로 전환하여 주의가 필요합니다. "
+            parts.append(f"외국인({foreign_total:+,.0f}억)과 기관({inst_total:+,.0f}억) 모두 순매도로 전환하여 주의가 필요합니다. ")
         
         if leading_list:
-            report += f"수급 주도 섹터는 **{', '.join(leading_list)}** 중심으로 형성되고 있습니다."
+            parts.append(f"수급 주도 섹터는 **{', '.join(leading_list)}** 중심으로 형성되고 있습니다.")
         
-        report += f"""
+        parts.append(f"""
 
 > **투자 판단**: 수급 주도 섹터 기준, **{sector_rank}** 순으로 시장 수익률 상회 가능성이 높습니다.
 
@@ -194,18 +224,18 @@ def generate_topdown_report(target_date):
 | **NASDAQ** | {nasdaq_val:,.0f} | {nasdaq_sign} {abs(nasdaq_chg):.2f}% |
 | **SOX (반도체)** | {sox_val:,.0f} | {sox_sign} {abs(sox_chg):.2f}% |
 
-"""
+""")
         # 환율 해석
         if ex_delta > 0:
-            report += f"""- **원화 약세**: 환율이 {ex_val:,.0f}원으로 상승. 수출주에 우호적이나 외국인 매수세 약화 가능성
+            parts.append(f"""- **원화 약세**: 환율이 {ex_val:,.0f}원으로 상승. 수출주에 우호적이나 외국인 매수세 약화 가능성
 - **KOSPI 영향**: 환율 상승 시 외국인 투자자의 달러 기준 수익률 하락 → 순매도 전환 위험 모니터링 필요
-"""
+""")
         else:
-            report += f"""- **원화 강세**: 환율이 {ex_val:,.0f}원으로 하락. 외국인 원화자산 매력도 상승 → 순매수 유인
+            parts.append(f"""- **원화 강세**: 환율이 {ex_val:,.0f}원으로 하락. 외국인 원화자산 매력도 상승 → 순매수 유인
 - **KOSPI 영향**: 원화 강세 시 외국인 투자자의 원화 자산 매력도 상승 → KOSPI 상승 지지
-"""
+""")
 
-        report += f"""
+        parts.append(f"""
 ---
 
 ## 2. 수급 분석
@@ -226,27 +256,25 @@ def generate_topdown_report(target_date):
 외국인 순매도 집중  →  {foreign_sell_sector_flow if foreign_sell_sector_flow else 'N/A'}
 ```
 
-"""
+""")
         # 외국인 순매수 TOP 5 테이블
-        report += "### 외국인 순매수 TOP 5\n\n"
+        parts.append("### 외국인 순매수 TOP 5\n\n")
         if not df_foreign_buy.empty:
-            report += "| 종목명 | 섹터 | 순매수(억) | 등락률 |\n|---|---|---|---|\n"
-            for i in range(min(5, len(df_foreign_buy))):
-                row = df_foreign_buy.iloc[i]
+            parts.append("| 종목명 | 섹터 | 순매수(억) | 등락률 |\n|---|---|---|---|\n")
+            for row in df_foreign_buy.head(5).to_dict('records'):  # 행마다 Series를 만들지 않고 dict로 한 번에
                 pct = row.get('등락률', 0)
                 pct_val = pct if isinstance(pct, (int, float)) else 0
-                report += f"| **{row['종목명']}** | {row.get('Sector', '')} | {row['순매수(억)']:+,.1f} | {pct_val:+.2f}% |\n"
+                parts.append(f"| **{row['종목명']}** | {row.get('Sector', '')} | {row['순매수(억)']:+,.1f} | {pct_val:+.2f}% |\n")
         
-        report += "\n### 기관 순매수 TOP 5\n\n"
+        parts.append("\n### 기관 순매수 TOP 5\n\n")
         if not df_inst_buy.empty:
-            report += "| 종목명 | 섹터 | 순매수(억) | 등락률 |\n|---|---|---|---|\n"
-            for i in range(min(5, len(df_inst_buy))):
-                row = df_inst_buy.iloc[i]
+            parts.append("| 종목명 | 섹터 | 순매수(억) | 등락률 |\n|---|---|---|---|\n")
+            for row in df_inst_buy.head(5).to_dict('records'):  # 행마다 Series를 만들지 않고 dict로 한 번에
                 pct = row.get('등락률', 0)
                 pct_val = pct if isinstance(pct, (int, float)) else 0
-                report += f"| **{row['종목명']}** | {row.get('Sector', '')} | {row['순매수(억)']:+,.1f} | {pct_val:+.2f}% |\n"
+                parts.append(f"| **{row['종목명']}** | {row.get('Sector', '')} | {row['순매수(억)']:+,.1f} | {pct_val:+.2f}% |\n")
         
-        report += """
+        parts.append("""
 ---
 
 ## 3. 리스크 요인
@@ -276,7 +304,7 @@ def generate_topdown_report(target_date):
 
 ## 4. 유망 섹터 선정 (수급 기반)
 
-"""
+""")
         # 유망 섹터 TOP 3 상세 분석
         if not top_sectors.empty:
             medals = ["🥇 1위", "🥈 2위", "🥉 3위"]
@@ -291,20 +319,20 @@ def generate_topdown_report(target_date):
                 f_flow = ""
                 i_flow = ""
                 if not df_foreign_all.empty and 'Sector' in df_foreign_all.columns:
-                    sec_f = df_foreign_all[df_foreign_all['Sector'] == sec_name]['순매수(억)'].sum()
+                    sec_f = f_sector_sum.get(sec_name, 0)
                     f_flow = "순매수" if sec_f > 0 else "순매도"
                 if not df_inst_all.empty and 'Sector' in df_inst_all.columns:
-                    sec_i = df_inst_all[df_inst_all['Sector'] == sec_name]['순매수(억)'].sum()
+                    sec_i = i_sector_sum.get(sec_name, 0)
                     i_flow = "순매수" if sec_i > 0 else "순매도"
                 
                 # 해당 섹터 대표 종목 3개
                 rep_stocks = []
                 if not df_foreign_all.empty and 'Sector' in df_foreign_all.columns:
-                    sec_stocks = df_foreign_all[df_foreign_all['Sector'] == sec_name].head(3)
+                    sec_stocks = f_groups.get(sec_name, no_rows).head(3)
                     rep_stocks = sec_stocks['종목명'].tolist()
                 rep_str = ", ".join(rep_stocks) if rep_stocks else "N/A"
                 
-                report += f"""### {medals[rank_idx]}: {sec_name}
+                parts.append(f"""### {medals[rank_idx]}: {sec_name}
 
 **추천 강도: {stars[rank_idx]} | 확신도: {confidence[rank_idx]}**
 
@@ -317,10 +345,10 @@ def generate_topdown_report(target_date):
 
 > **핵심 논리**: {sec_name} 섹터는 당일 {sec_ret:+.2f}%의 등락률을 기록하며 시장을 주도하고 있습니다. 외국인({f_flow})과 기관({i_flow}) 수급이 집중되고 있어, 단기적으로 관심이 확대될 가능성이 높습니다. 대표 종목({rep_str})의 기술적 타점을 2페이지 [Swing Trading]에서 확인하세요.
 
-"""
+""")
 
         # 섹터 비교 매트릭스
-        report += "---\n\n## 섹터 비교 매트릭스\n\n"
+        parts.append("---\n\n## 섹터 비교 매트릭스\n\n")
         
         if not top_sectors.empty and not bottom_sectors.empty:
             all_sectors_for_matrix = list(top_sectors.index[:3])
@@ -329,51 +357,32 @@ def generate_topdown_report(target_date):
                 if worst not in all_sectors_for_matrix:
                     all_sectors_for_matrix.append(worst)
             
-            header = "| 기준 |"
-            separator = "|---|"
-            for s in all_sectors_for_matrix:
-                header += f" {s} |"
-                separator += ":---:|"
-            report += header + "\n" + separator + "\n"
-            
-            for metric_name in ["등락률", "외국인 수급", "기관 수급"]:
-                row_str = f"| {metric_name} |"
-                for s in all_sectors_for_matrix:
-                    if metric_name == "등락률":
-                        ret = sector_returns.get(s, 0)
-                        row_str += " 🟢 |" if ret > 0.5 else (" 🟡 |" if ret > -0.5 else " 🔴 |")
-                    elif metric_name == "외국인 수급":
-                        if not df_foreign_all.empty and 'Sector' in df_foreign_all.columns:
-                            sv = df_foreign_all[df_foreign_all['Sector'] == s]['순매수(억)'].sum()
-                            row_str += " 🟢 |" if sv > 50 else (" 🟡 |" if sv > -50 else " 🔴 |")
-                        else:
-                            row_str += " 🟡 |"
-                    elif metric_name == "기관 수급":
-                        if not df_inst_all.empty and 'Sector' in df_inst_all.columns:
-                            sv = df_inst_all[df_inst_all['Sector'] == s]['순매수(억)'].sum()
-                            row_str += " 🟢 |" if sv > 50 else (" 🟡 |" if sv > -50 else " 🔴 |")
-                        else:
-                            row_str += " 🟡 |"
-                report += row_str + "\n"
-            
+            parts.append("| 기준 | " + " | ".join(all_sectors_for_matrix) + " |\n")
+            parts.append("|---|" + ":---:|" * len(all_sectors_for_matrix) + "\n")
+
+            def _signal(v, th):
+                return "🟢" if v > th else ("🟡" if v > -th else "🔴")
+
+            # 지표별 섹터 값은 dict 조회로 (수급 데이터/섹터가 없으면 0 → 🟡)
+            metrics = (
+                ("등락률", sector_returns.to_dict(), 0.5),
+                ("외국인 수급", f_sector_sum.to_dict(), 50),
+                ("기관 수급", i_sector_sum.to_dict(), 50),
+            )
+            for metric_name, values, th in metrics:
+                cells = [_signal(values.get(s, 0), th) for s in all_sectors_for_matrix]
+                parts.append(f"| {metric_name} | " + " | ".join(cells) + " |\n")
+
             # 종합 판정
-            verdict_row = "| **종합 판정** |"
-            for idx, s in enumerate(all_sectors_for_matrix):
-                if idx == 0:
-                    verdict_row += " **1위** |"
-                elif idx == 1:
-                    verdict_row += " **2위** |"
-                elif idx == 2:
-                    verdict_row += " **3위** |"
-                else:
-                    verdict_row += " 회피 |"
-            report += verdict_row + "\n"
+            verdicts = ["**1위**", "**2위**", "**3위**"][:len(all_sectors_for_matrix)]
+            verdicts += ["회피"] * (len(all_sectors_for_matrix) - len(verdicts))
+            parts.append("| **종합 판정** | " + " | ".join(verdicts) + " |\n")
         
         # 회피 섹터
         if not bottom_sectors.empty:
             worst_sec = bottom_sectors.index[0]
             worst_ret = bottom_sectors.iloc[0]
-            report += f"""
+            parts.append(f"""
 ---
 
 ## Appendix: 회피 섹터
@@ -381,19 +390,21 @@ def generate_topdown_report(target_date):
 ### ⚠️ {worst_sec} — 단기 비중 축소 권고
 
 - 당일 섹터 평균 등락률 **{worst_ret:+.2f}%**로 시장 대비 부진
-"""
+""")
             if not df_foreign_all.empty and 'Sector' in df_foreign_all.columns:
-                sv = df_foreign_all[df_foreign_all['Sector'] == worst_sec]['순매수(억)'].sum()
+                sv = f_sector_sum.get(worst_sec, 0)
                 if sv < 0:
-                    report += f"- 외국인 **{sv:,.0f}억원 순매도** 진행 중\n"
-            report += "- 수급과 모멘텀이 동시에 약화되어 단기 회복은 제한적\n"
+                    parts.append(f"- 외국인 **{sv:,.0f}억원 순매도** 진행 중\n")
+            parts.append("- 수급과 모멘텀이 동시에 약화되어 단기 회복은 제한적\n")
 
-        report += f"""
+        parts.append(f"""
 ---
 
 > **면책조항**: 본 보고서는 공개된 시장 데이터(pykrx, FinanceDataReader)에 기반하여 AI 알고리즘이 자동 생성한 분석이며, 투자 권유가 아닙니다. 투자 결정은 본인의 판단과 책임 하에 이루어져야 합니다.
-"""
+""")
         
+        report = "".join(parts)
+
         # ══════════════════════════════════════════
         # 3. 저장 (Supabase 우선 → 로컬 파일 fallback)
         # ══════════════════════════════════════════
@@ -404,13 +415,14 @@ def generate_topdown_report(target_date):
         except Exception:
             pass
         
-        # 로컬 파일도 항상 저장 (개발 편의)
-        filename = f"kospi_topdown_report_{target_date}.md"
-        try:
-            with open(filename, "w", encoding="utf-8") as f:
-                f.write(report)
-        except:
-            filename = None  # 서버리스 환경에서 쓰기 실패 가능
+        # 로컬 파일도 저장 (개발 편의, 서버리스 환경은 생략)
+        filename = None
+        if not _IS_SERVERLESS:
+            filename = f"kospi_topdown_report_{target_date}.md"
+            try:
+                _write_report_file(filename, report)
+            except OSError:
+                filename = None  # 읽기 전용 디렉터리 등 쓰기 실패
         
         storage_info = "DB" if saved_to_db else ("파일" if filename else "메모리")
         return report, filename, storage_info
@@ -1,5 +1,9 @@
 """Supabase 클라이언트 (FastAPI용 — streamlit 의존성 제거)"""
 import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
 
 try:
     from dotenv import load_dotenv
@@ -7,11 +11,43 @@ try:
 except ImportError:
     pass
 
+try:
+    import httpx
+    from supabase import create_client, ClientOptions
+except ImportError:
+    create_client = None
+
+# 클라이언트 생성 실패 후 재시도까지 대기 (장애 중 요청마다 재연결하지 않도록)
+_CLIENT_RETRY_INTERVAL = 60.0
+
+_client = None
+_client_failed_at = None  # 마지막 생성 실패 시각 (time.monotonic)
+_client_lock = threading.Lock()  # 동시 요청이 첫 호출에 몰려도 클라이언트는 하나만 생성
+
 
 def get_supabase_client():
-    try:
-        from supabase import create_client, Client
-    except ImportError:
+    """프로세스당 한 번만 생성해 재사용 (실패 시 _CLIENT_RETRY_INTERVAL초 뒤 재시도, 인증 정보 변경 시 reset_supabase_client)"""
+    global _client, _client_failed_at
+    client = _client
+    if client is not None:
+        return client
+    with _client_lock:
+        if _client is None and (_client_failed_at is None
+                                or time.monotonic() - _client_failed_at >= _CLIENT_RETRY_INTERVAL):
+            _client = _create_supabase_client()
+            _client_failed_at = None if _client is not None else time.monotonic()
+        return _client
+
+
+def _make_http_client():
+    """PostgREST/Storage가 함께 쓰는 keep-alive 커넥션 풀 (요청마다 TLS 핸드셰이크 반복 방지)"""
+    limits = httpx.Limits(max_keepalive_connections=10, max_connections=20, keepalive_expiry=30)
+    transport = httpx.HTTPTransport(http2=True, retries=2, limits=limits)
+    return httpx.Client(transport=transport, timeout=10, follow_redirects=True)
+
+
+def _create_supabase_client():
+    if create_client is None:
         return None
     
     url = os.environ.get("SUPABASE_URL")
@@ -21,11 +57,109 @@ def get_supabase_client():
         return None
     
     try:
-        return create_client(url, key)
-    except:
+        return create_client(url, key, options=ClientOptions(httpx_client=_make_http_client()))
+    except Exception:
         return None
 
 
+def _ttl_cache(ttl, maxsize=64):
+    """인자별 결과를 ttl초 동안 재사용 (같은 리포트 반복 조회 시 Supabase 왕복 생략)
+
+    인자가 요청 파라미터(날짜)라 종류가 무한하므로, 저장 시 만료 항목을 치우고 maxsize개를 넘으면
+    가장 오래된 항목부터 버린다 (앱의 st.cache_data max_entries=64와 같은 상한).
+    """
+    def decorator(func):
+        store = OrderedDict()  # 저장 시각 순 — 앞쪽이 가장 오래된 항목
+        lock = threading.Lock()
+
+        @wraps(func)
+        def wrapper(*args):
+            with lock:
+                hit = store.get(args)
+            if hit is not None and time.monotonic() - hit[0] < ttl:
+                return hit[1]
+            value = func(*args)
+            now = time.monotonic()
+            with lock:
+                store[args] = (now, value)
+                store.move_to_end(args)
+                while store:
+                    oldest = next(iter(store.values()))
+                    if len(store) <= maxsize and now - oldest[0] < ttl:
+                        break
+                    store.popitem(last=False)
+            return value
+
+        def clear():
+            with lock:
+                store.clear()
+
+        wrapper.clear = clear
+        return wrapper
+    return decorator
+
+
+def _swr_cache(soft_ttl, hard_ttl):
+    """stale-while-revalidate: soft_ttl이 지난 값은 바로 반환하고 백그라운드 스레드로 갱신,
+    hard_ttl이 지나면 직접 다시 조회 (폴링되는 조회가 만료 시점에 Supabase 왕복을 기다리지 않도록)"""
+    def decorator(func):
+        store = {}
+        refreshing = set()
+        lock = threading.Lock()
+        generation = [0]  # clear() 이전에 시작된 갱신 결과는 버림
+
+        def refresh(args, gen):
+            try:
+                value = func(*args)
+            except Exception:
+                return  # 갱신 실패 시 기존 값 유지 (다음 호출에서 다시 시도)
+            else:
+                with lock:
+                    if generation[0] == gen:
+                        store[args] = (time.monotonic(), value)
+            finally:
+                with lock:
+                    refreshing.discard(args)
+
+        @wraps(func)
+        def wrapper(*args):
+            with lock:
+                hit = store.get(args)
+                gen = generation[0]
+            if hit is not None:
+                age = time.monotonic() - hit[0]
+                if age < soft_ttl:
+                    return hit[1]
+                if age < hard_ttl:
+                    with lock:
+                        start = args not in refreshing
+                        refreshing.add(args)
+                    if start:
+                        threading.Thread(target=refresh, args=(args, gen), daemon=True).start()
+                    return hit[1]
+            value = func(*args)
+            with lock:
+                if generation[0] == gen:
+                    store[args] = (time.monotonic(), value)
+            return value
+
+        def clear():
+            with lock:
+                generation[0] += 1
+                store.clear()
+
+        wrapper.clear = clear
+        return wrapper
+    return decorator
+
+
+def reset_supabase_client():
+    global _client, _client_failed_at
+    with _client_lock:
+        _client = None
+        _client_failed_at = None
+
+
 def save_report(target_date: str, report_content: str) -> bool:
     client = get_supabase_client()
     if not client:
@@ -35,36 +169,55 @@ def save_report(target_date: str, report_content: str) -> bool:
             {"target_date": target_date, "content": report_content, "report_type": "topdown"},
             on_conflict="target_date,report_type"
         ).execute()
+        # 저장한 리포트가 바로 보이도록 조회 캐시 무효화
+        _fetch_report.clear()
+        _fetch_report_latest.clear()
         return True
-    except:
+    except Exception:
         return False
 
 
-def load_report(target_date: str) -> str | None:
+# 조회 캐시: "행 없음"(None)만 캐시하고 네트워크/인증 오류는 예외로 올려 캐시에 남기지 않음
+@_ttl_cache(60)
+def _fetch_report(target_date: str) -> str | None:
     client = get_supabase_client()
     if not client:
         return None
+    result = client.table("reports").select("content").eq(
+        "target_date", target_date
+    ).eq("report_type", "topdown").order("created_at", desc=True).limit(1).execute()
+    if result.data:
+        return result.data[0]["content"]
+    return None
+
+
+def load_report(target_date: str) -> str | None:
     try:
-        result = client.table("reports").select("content").eq(
-            "target_date", target_date
-        ).eq("report_type", "topdown").order("created_at", desc=True).limit(1).execute()
-        if result.data:
-            return result.data[0]["content"]
-        return None
-    except:
+        return _fetch_report(target_date)
+    except Exception:
         return None
 
 
-def load_report_latest() -> tuple[str | None, str | None]:
+@_swr_cache(30, 300)  # 프론트엔드가 폴링하는 최신 리포트 — 만료 직후에도 캐시값으로 바로 응답
+def _fetch_report_latest() -> tuple[str | None, str | None]:
     client = get_supabase_client()
     if not client:
         return None, None
+    result = client.table("reports").select("content, target_date").eq(
+        "report_type", "topdown"
+    ).order("created_at", desc=True).limit(1).execute()
+    if result.data:
+        return result.data[0]["content"], result.data[0]["target_date"]
+    return None, None
+
+
+def load_report_latest() -> tuple[str | None, str | None]:
     try:
-        result = client.table("reports").select("content, target_date").eq(
-            "report_type", "topdown"
-        ).order("created_at", desc=True).limit(1).execute()
-        if result.data:
-            return result.data[0]["content"], result.data[0]["target_date"]
-        return None, None
-    except:
+        return _fetch_report_latest()
+    except Exception:
         return None, None
+
+
+# 선택: import 시점에 백그라운드 스레드로 클라이언트를 미리 생성 (SUPABASE_PREWARM=1)
+if os.environ.get("SUPABASE_PREWARM") == "1":
+    threading.Thread(target=get_supabase_client, daemon=True).start()
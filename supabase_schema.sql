@@ -15,10 +15,20 @@ CREATE TABLE IF NOT EXISTS reports (
     UNIQUE(target_date, report_type)
 );
 
+-- 긴 Markdown 본문의 TOAST 압축을 pglz → lz4로 (PostgreSQL 14+, 압축/해제가 빨라 조회 지연 감소)
+--   기존 행은 다시 쓸 때(upsert) 새 방식으로 저장됨
+ALTER TABLE reports ALTER COLUMN content SET COMPRESSION lz4;
+
 -- 인덱스
 CREATE INDEX IF NOT EXISTS idx_reports_date ON reports(target_date);
 CREATE INDEX IF NOT EXISTS idx_reports_type ON reports(report_type);
 CREATE INDEX IF NOT EXISTS idx_reports_created ON reports(created_at DESC);
+-- 조회 경로용 복합 인덱스 (정렬 없이 인덱스 스캔으로 1건)
+--   load_report_latest: report_type = ? ORDER BY created_at DESC LIMIT 1
+--   load_report:        report_type = ? AND target_date <= ? ORDER BY target_date DESC LIMIT 1
+--   content는 수 KB Markdown이라 INCLUDE하지 않음 (btree 행 크기 한도 초과 위험)
+CREATE INDEX IF NOT EXISTS idx_reports_type_created ON reports(report_type, created_at DESC) INCLUDE (target_date);
+CREATE INDEX IF NOT EXISTS idx_reports_type_date ON reports(report_type, target_date DESC, created_at DESC);
 
 -- RLS (Row Level Security) 설정
 -- anon key로 읽기/쓰기 가능하게 (퍼블릭 대시보드이므로)
@@ -41,18 +51,24 @@ CREATE TABLE IF NOT EXISTS analysis_results (
     id BIGSERIAL PRIMARY KEY,
     target_date TEXT NOT NULL,                  -- '20260215' 형식
     result_type TEXT NOT NULL DEFAULT 'swing',  -- 'swing' | 'topdown' 등
-    results_json TEXT NOT NULL,                 -- 전체 스크리닝 결과 (JSON 문자열)
-    top_picks_json TEXT,                        -- TOP 3 종목 (JSON 문자열)
+    results_json TEXT NOT NULL,                 -- 전체 스크리닝 결과 (base64 Parquet, 예전 행은 JSON 문자열)
+    top_picks_json JSONB,                       -- TOP 3 종목 (JSON 배열, 응답에 그대로 포함)
     stock_count INTEGER DEFAULT 0,             -- 분석된 종목 수
     created_at TIMESTAMPTZ DEFAULT NOW(),
 
     UNIQUE(target_date, result_type)
 );
 
+ALTER TABLE analysis_results ALTER COLUMN results_json SET COMPRESSION lz4;
+-- 예전 스키마(TEXT)로 만든 테이블 변환 — 이미 JSONB면 그대로
+ALTER TABLE analysis_results ALTER COLUMN top_picks_json TYPE JSONB USING top_picks_json::jsonb;
+
 -- 인덱스
 CREATE INDEX IF NOT EXISTS idx_analysis_date ON analysis_results(target_date);
 CREATE INDEX IF NOT EXISTS idx_analysis_type ON analysis_results(result_type);
 CREATE INDEX IF NOT EXISTS idx_analysis_created ON analysis_results(created_at DESC);
+-- load_swing_results: result_type = ? ORDER BY created_at DESC LIMIT 1
+CREATE INDEX IF NOT EXISTS idx_analysis_type_created ON analysis_results(result_type, created_at DESC);
 
 -- RLS
 ALTER TABLE analysis_results ENABLE ROW LEVEL SECURITY;
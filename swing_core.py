@@ -0,0 +1,727 @@
+"""
+스윙 트레이딩 분석 공통 모듈 (Streamlit 의존성 없음)
+
+scripts/run_daily_analysis.py, swing_screener.py, utils/analysis.py(앱)가 함께 사용합니다.
+  - fetch_price_panel: 종목별 일봉 병렬 조회 (프로세스 내 캐시)
+  - fetch_daily_panel: 영업일별 전종목 스냅샷 조회 → (티커, 날짜) 패널
+  - stack_panel / pivot_daily_panel: 일봉 → 컬럼별 (행 × 종목) 행렬 (종목별 DataFrame 없이 피처 계산)
+  - score_frame: 종목 피처 테이블 → 점수 배열 연산 + 컷 통과 종목 코멘트
+  - compute_swing: 수급/펀더멘털/섹터 + 일봉 패널 → 스윙 점수 결과
+"""
+import time
+import concurrent.futures
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+import requests
+from pykrx import stock
+
+# 일봉 조회 재시도 — pykrx(네이버 경로)는 429/5xx에도 예외 대신 빈 DataFrame을 돌려주므로
+# 빈 결과/연결 오류를 재시도 대상으로 본다 (대기: 1초, 2초 → 종목당 최대 3초)
+MAX_RETRIES = 2
+RETRY_BACKOFF = 1.0
+
+# 최소 스윙 점수 (이 점수 미만은 결과에서 제외)
+MIN_SCORE = 20
+
+# 손절가 계산용 ATR 기간 (True Range 단순평균)
+ATR_PERIOD = 14
+
+# 일자별 스냅샷에서 전일 대비 종가 비율이 이 범위를 벗어나면 액면분할/병합 등으로 보고 수정주가로 재조회
+# (가격제한폭 ±30% 밖 — 정상 거래로는 나올 수 없는 변동)
+SPLIT_RATIO_RANGE = (0.65, 1.35)
+
+# 지표 계산용 행렬 dtype — KRX 가격(최대 ~1e6)은 float32로 정확히 표현되며, 메모리 대역폭이 float64의 절반
+PANEL_DTYPE = np.float32
+
+# (ticker, start, end) → 일봉 DataFrame. 같은 프로세스에서 재실행 시 재조회하지 않음
+#   최근 사용 순으로 PANEL_CACHE_MAX개까지만 보관 (여러 기준일을 돌려도 메모리가 계속 늘지 않도록)
+PANEL_CACHE_MAX = 512
+_PANEL_CACHE = OrderedDict()
+
+
+# ═══════════════════════════════════════
+# 데이터 조회
+# ═══════════════════════════════════════
+def fetch_ohlcv(start, end, ticker):
+    """종목 일봉 조회 — 빈 결과(요청 제한/일시적 서버 오류)나 연결 오류면 지수 백오프로 재시도
+
+    재시도 후에도 비어 있으면 빈 DataFrame을 반환 (거래정지 등 실제로 데이터가 없는 종목)
+    """
+    for retry in range(MAX_RETRIES + 1):
+        try:
+            df = stock.get_market_ohlcv(start, end, ticker)
+        except requests.exceptions.RequestException:
+            if retry == MAX_RETRIES:
+                raise
+        else:
+            if df is not None and not df.empty:
+                return df
+            if retry == MAX_RETRIES:
+                return pd.DataFrame()
+        time.sleep(RETRY_BACKOFF * 2 ** retry)
+
+
+def fetch_price_panel(tickers, start, end, max_workers=16):
+    """여러 종목의 일봉을 병렬 조회해 {ticker: DataFrame}으로 반환 (조회 실패 종목은 제외)"""
+    panel = {}
+    missing = []
+    for t in tickers:
+        cached = _PANEL_CACHE.get((t, start, end))
+        if cached is not None:
+            _PANEL_CACHE.move_to_end((t, start, end))
+            panel[t] = cached
+        else:
+            missing.append(t)
+
+    if missing:
+        def _fetch(ticker):
+            try:
+                return fetch_ohlcv(start, end, ticker)
+            except Exception:
+                return None
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(_fetch, t): t for t in missing}
+            done = 0
+            for future in concurrent.futures.as_completed(futures):
+                df_price = future.result()
+                if df_price is not None and not df_price.empty:
+                    ticker = futures[future]
+                    _PANEL_CACHE[(ticker, start, end)] = df_price
+                    if len(_PANEL_CACHE) > PANEL_CACHE_MAX:
+                        _PANEL_CACHE.popitem(last=False)
+                    panel[ticker] = df_price
+                done += 1
+                if done % 10 == 0:
+                    print(f"  ... {done}/{len(missing)} 완료")
+
+    return panel
+
+
+def fetch_daily_panel(start, end, market="KOSPI", max_workers=16, progress=None):
+    """기간 내 영업일마다 전종목 OHLCV 스냅샷을 받아 (티커, 날짜) MultiIndex 패널로 결합
+
+    HTTP 호출 수가 종목 수가 아닌 영업일 수(90일 구간 ≈ 60회)에 비례한다.
+    일자별 스냅샷은 수정주가가 아니므로, 전일 대비 종가 비율이 SPLIT_RATIO_RANGE를 벗어난 종목
+    (기간 내 액면분할/병합)만 fetch_ohlcv(수정주가)로 다시 받아 OHLCV를 교체한다. 재조회에 실패한
+    종목은 불연속 가격으로 점수가 왜곡되므로 패널에서 제외.
+    progress: 진행률(0~1)을 받는 콜백 — 매 완료가 아니라 약 5% 단위(최대 20회)로만 호출
+    """
+    days = [d.strftime("%Y%m%d") for d in stock.get_previous_business_days(fromdate=start, todate=end)]
+    if not days:
+        return pd.DataFrame()
+
+    def _fetch(day):
+        try:
+            df = stock.get_market_ohlcv_by_ticker(day, market)
+        except Exception:
+            return None
+        if df is None or df.empty or (df[["시가", "고가", "저가", "종가"]] == 0).all(axis=None):
+            return None
+        return df.assign(날짜=pd.Timestamp(day))
+
+    step = max(1, len(days) // 20)
+    frames = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for done, df in enumerate(executor.map(_fetch, days), 1):
+            if df is not None:
+                frames.append(df)
+            if progress is not None and (done % step == 0 or done == len(days)):
+                progress(done / len(days))
+    if not frames:
+        return pd.DataFrame()
+
+    panel = pd.concat(frames)
+    panel.index.name = "티커"
+    panel = panel.set_index("날짜", append=True).sort_index()
+    return _adjust_split_tickers(panel, start, end, max_workers)
+
+
+def _adjust_split_tickers(panel, start, end, max_workers):
+    """일자별 스냅샷 패널에서 분할/병합으로 종가가 불연속인 종목만 수정주가로 교체"""
+    close = panel["종가"].where(panel["종가"] > 0)  # 거래정지일(0원)은 비교에서 제외
+    ratio = close / close.groupby(level="티커").ffill().groupby(level="티커").shift(1)
+    lo, hi = SPLIT_RATIO_RANGE
+    jumped = ratio[(ratio < lo) | (ratio > hi)].index.get_level_values("티커").unique().tolist()
+    if not jumped:
+        return panel
+
+    print(f"  ... 액면분할/병합 의심 {len(jumped)}종목 수정주가로 재조회")
+    adj_cols = [c for c in ["시가", "고가", "저가", "종가", "거래량"] if c in panel.columns]
+
+    def _fetch(ticker):
+        try:
+            return fetch_ohlcv(start, end, ticker)
+        except Exception:
+            return None
+
+    dropped = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(jumped))) as executor:
+        for ticker, df in zip(jumped, executor.map(_fetch, jumped)):
+            if df is None or df.empty:
+                dropped.append(ticker)
+                continue
+            adj = df[adj_cols].set_axis(
+                pd.MultiIndex.from_product([[ticker], pd.DatetimeIndex(df.index)], names=["티커", "날짜"]))
+            idx = panel.index.intersection(adj.index)
+            panel.loc[idx, adj_cols] = adj.loc[idx, adj_cols].to_numpy()
+    if dropped:
+        panel = panel.drop(index=dropped, level="티커")
+    return panel
+
+
+def select_targets(df_foreign, df_inst, top_n=50):
+    """외국인/기관 순매수 거래대금 상위 종목 합집합
+
+    일봉 조회 전에 걸러내기: 외국인·기관 모두 순매도(거래대금 ≤ 0)인 종목은 상위 N 안에 있어도 제외
+    (순매수 종목이 N개 미만인 날 상위 목록에 순매도 종목이 섞여 들어옴).
+    """
+    top_foreign = set(df_foreign.sort_values('순매수거래대금', ascending=False).head(top_n).index)
+    top_inst = set(df_inst.sort_values('순매수거래대금', ascending=False).head(top_n).index)
+    buying = set(df_foreign.index[df_foreign['순매수거래대금'] > 0]) | set(df_inst.index[df_inst['순매수거래대금'] > 0])
+    return list((top_foreign | top_inst) & buying)
+
+
+def stack_panel(panel, min_rows=30):
+    """{ticker: 일봉} → 최근일 기준으로 끝을 맞춘 (행 × 종목) 행렬
+
+    종목마다 상장일/조회 구간이 달라 길이가 다르므로, 날짜가 아닌 '뒤에서 n번째 행'으로 정렬하고
+    앞쪽 빈 칸은 NaN으로 채운다 (종목별 iloc[-n] 계산과 동일한 결과).
+    행렬은 PANEL_DTYPE(float32) — 거래량도 NaN 패딩이 필요해 정수형 대신 float32로 둔다.
+    반환: (tickers, {컬럼명: (행 × 종목) C-연속 ndarray}) — 데이터가 min_rows 미만인 종목은 제외
+    """
+    tickers = [t for t, df in panel.items() if df is not None and len(df) >= min_rows]
+    if not tickers:
+        return [], {}
+
+    n_rows = max(len(panel[t]) for t in tickers)
+    mats = {}
+    for col in ("시가", "고가", "저가", "종가", "거래량"):
+        m = np.full((n_rows, len(tickers)), np.nan, dtype=PANEL_DTYPE)
+        for j, t in enumerate(tickers):
+            v = panel[t][col].to_numpy(dtype=PANEL_DTYPE)
+            m[n_rows - len(v):, j] = v
+        mats[col] = m
+    return tickers, mats
+
+
+def pivot_daily_panel(panel, tickers, min_rows=30):
+    """fetch_daily_panel의 (티커, 날짜) 패널 → stack_panel과 같은 형태의 (tickers, {컬럼명: ndarray})
+
+    종목별 DataFrame을 만들지 않고 컬럼마다 unstack 한 번으로 (영업일 × 종목) 행렬을 만든다.
+    상장 전 구간은 NaN. 기준일(마지막 행) 종가가 없거나 유효 일수가 min_rows 미만인 종목은 제외.
+    """
+    if panel.empty:
+        return [], {}
+    sub = panel[panel.index.get_level_values(0).isin(tickers)]
+    if sub.empty:
+        return [], {}
+
+    close = sub["종가"].unstack(level=0)
+    keep = close.columns[(close.notna().sum() >= min_rows) & close.iloc[-1].notna()].tolist()
+    if not keep:
+        return [], {}
+    mats = {
+        col: _c_matrix(sub[col].unstack(level=0)[keep])
+        for col in ("시가", "고가", "저가", "종가", "거래량")
+    }
+    return keep, mats
+
+
+def _c_matrix(df):
+    """DataFrame → PANEL_DTYPE의 C-연속(행 우선) ndarray
+
+    DataFrame.to_numpy()는 내부 블록을 전치해 돌려주므로 보통 F-연속이다. 지표 계산은 행(날짜) 단위
+    재귀/슬라이스를 반복하므로, 여기서 한 번 C-연속으로 복사해 두어야 매 스텝이 연속 메모리를 읽는다.
+    """
+    return np.ascontiguousarray(df.to_numpy(dtype=PANEL_DTYPE))
+
+
+def _last_window(mat, window, how="mean"):
+    """각 종목(열)의 마지막 window행 평균/최대 — 구간에 NaN이 있으면 NaN (rolling(window).iloc[-1]과 동일)"""
+    if mat.shape[0] < window:
+        return np.full(mat.shape[1], np.nan, dtype=mat.dtype)
+    win = sliding_window_view(mat, window, axis=0)[-1]
+    return win.max(axis=-1) if how == "max" else win.mean(axis=-1)
+
+
+def wilder_last(values, period=14):
+    """ewm(com=period-1, min_periods=period).mean().iloc[-1]을 종목(열) 축 벡터 연산으로 계산
+
+    시간 축 재귀는 순차적이지만 한 스텝에서 모든 종목을 동시에 갱신한다.
+    pandas ewm(adjust=True, ignore_na=False)과 같은 방식으로 NaN(상장 전 구간 등)을 처리한다.
+    """
+    dtype = values.dtype
+    decay = dtype.type(1.0 - 1.0 / period)
+    n_cols = values.shape[1]
+    weighted = np.full(n_cols, np.nan, dtype=dtype)
+    old_wt = np.ones(n_cols, dtype=dtype)
+    nobs = np.zeros(n_cols, dtype=np.int64)
+    for x in values:
+        obs = ~np.isnan(x)
+        nobs += obs
+        started = ~np.isnan(weighted)
+        first = obs & ~started
+        weighted[first] = x[first]
+        old_wt[started] *= decay
+        upd = started & obs
+        weighted[upd] = (old_wt[upd] * weighted[upd] + x[upd]) / (old_wt[upd] + 1.0)
+        old_wt[upd] += 1.0
+    return np.where(nobs >= period, weighted, dtype.type(np.nan))
+
+
+def panel_features(tickers, mats):
+    """stack_panel 행렬에서 종목별 점수 계산용 수치 피처를 한 번에 추출 (index=ticker)
+
+    행렬 연산은 float32로 하고, 종목당 스칼라인 결과 피처만 float64로 올려 점수/코멘트 계산에 넘긴다.
+    """
+    close_m, high_m, low_m, vol_m = mats["종가"], mats["고가"], mats["저가"], mats["거래량"]
+    n_days = (~np.isnan(close_m)).sum(axis=0)
+    nan, zero = close_m.dtype.type(np.nan), close_m.dtype.type(0)
+    vol_ma20 = _last_window(vol_m, 20)
+
+    prev_close = np.vstack([np.full((1, close_m.shape[1]), nan), close_m[:-1]])
+    delta = close_m - prev_close
+    _gain = wilder_last(np.where(delta > 0, delta, np.where(np.isnan(delta), nan, zero)))
+    _loss = wilder_last(np.where(delta < 0, -delta, np.where(np.isnan(delta), nan, zero)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - (100 / (1 + _gain / _loss))
+    # ATR(14일 단순평균)에는 마지막 14행의 True Range만 필요 — 패널 전체가 아닌 그 구간만 계산
+    h, l, pc = high_m[-ATR_PERIOD:], low_m[-ATR_PERIOD:], prev_close[-ATR_PERIOD:]
+    tr = np.fmax(np.fmax(h - l, np.abs(h - pc)), np.abs(l - pc))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vol_ratio = np.where(vol_ma20 > 0, vol_m[-1] / vol_ma20, zero)
+
+    # 최근일/기준일 값은 행렬에서 1차원 슬라이스로 한 번씩만 꺼낸다
+    # 수익률은 종가(정수) 두 개의 비율이므로 float64 행 벡터로 계산
+    close = close_m[-1].astype(np.int64)
+    open_p = mats["시가"][-1].astype(np.int64)
+    high = high_m[-1].astype(np.int64)
+    close_f = close.astype(np.float64)
+
+    def _ret(n):
+        base = close_m[-n].astype(np.float64)
+        return (close_f - base) / base * 100
+
+    feat = pd.DataFrame({
+        "close": close,
+        "open_p": open_p,
+        "body_len": np.abs(close - open_p),
+        "upper_tail": high - np.maximum(close, open_p),
+        "ma5": _last_window(close_m, 5),
+        "ma20": _last_window(close_m, 20),
+        "ma60": np.where(n_days >= 60, _last_window(close_m, 60), nan),
+        "vol_ratio": vol_ratio,
+        "rsi": rsi,
+        "daily_chg": _ret(2),
+        "ret_5d": _ret(5),
+        "ret_20d": _ret(20),
+        "high_60d": _last_window(high_m, 60, how="max"),
+        "atr": _last_window(tr, ATR_PERIOD),
+        "n_days": n_days,
+    }, index=tickers)
+    return feat.astype({c: np.float64 for c in ("ma5", "ma20", "ma60", "vol_ratio", "rsi", "high_60d", "atr")})
+
+
+# ═══════════════════════════════════════
+# 스윙 점수 계산 (종목 축 배열 연산)
+# ═══════════════════════════════════════
+def supply_scores(f_amt, i_amt, is_f_buy, is_i_buy, is_indi_sell):
+    """수급 점수 (0~30점) — 일봉과 무관하므로 수급 데이터만으로 종목 전체를 한 번에 계산"""
+    f_log = np.log1p(np.abs(f_amt) / 1e8)
+    i_log = np.log1p(np.abs(i_amt) / 1e8)
+    both_log = np.log1p((np.abs(f_amt) + np.abs(i_amt)) / 1e8)
+    supply = np.where(is_f_buy & is_i_buy, 20.0 + np.minimum(10.0, both_log * 1.5),
+             np.where(is_f_buy, 12.0 + np.minimum(6.0, f_log * 1.2),
+             np.where(is_i_buy, 12.0 + np.minimum(6.0, i_log * 1.2), 0.0)))
+    supply[is_indi_sell] += 5.0
+    return supply
+
+
+def score_all(close, open_p, body_len, upper_tail, ma5, ma20, ma60, vol_ratio, rsi, daily_chg,
+              ret_5d, ret_20d, high_60d, atr, n_days,
+              f_amt, i_amt, is_f_buy, is_i_buy, is_indi_sell, in_leading_sector, pbr, app_rules=False):
+    """종목별 수치 피처 배열을 받아 스윙 점수/목표가/손절가를 한 번에 계산
+
+    모든 인자는 같은 종목 순서로 정렬된 1차원 배열. n_days(유효 일봉 수)가 60 미만인 종목은
+    60일선이 없으므로 정배열 판정에서 제외한다.
+    app_rules=True면 앱(utils/analysis.py) 전용 가점(윗꼬리 캔들 +0.5, 60일 고점 대비 70% 이상 +1)을 더한다.
+    반환: (scores, target_price, stop_loss, parts) — parts는 코멘트용 항목별 점수 dict
+    """
+    # [A] Top-Down 섹터 (0~8점)
+    sector_score = np.where(in_leading_sector, 8.0, 0.0)
+
+    # [B] 수급 (0~30점)
+    supply_score = supply_scores(f_amt, i_amt, is_f_buy, is_i_buy, is_indi_sell)
+
+    # [C] 기술적 (0~30점)
+    candle_conds = [(daily_chg > 5) & (body_len > upper_tail * 2), (daily_chg > 2) & (close > open_p)]
+    candle_pts = [3.0, 1.5]
+    if app_rules:
+        candle_conds.append((upper_tail > body_len * 2) & (daily_chg > 0))
+        candle_pts.append(0.5)
+    tech_score = np.select(candle_conds, candle_pts, 0.0)
+    golden_cross = (ma5 > ma20) & (ma20 > ma60) & (n_days >= 60)
+    spread = np.where(ma60 > 0, (close - ma60) / ma60 * 100, 0.0)
+    tech_score = tech_score + np.select(
+        [golden_cross, (close > ma20) & (ma5 > ma20), close > ma20],
+        [7.0 + np.clip(spread * 0.3, 0, 3.0), 4.0, 2.0], 0.0,
+    )
+    tech_score = tech_score + np.where(vol_ratio >= 1.2, np.minimum(12.0, 3.0 + (vol_ratio - 1.2) * 11.25), 0.0)
+    tech_score = tech_score + np.fmax(0, 8.0 - np.abs(rsi - 45.0) * 0.2)
+
+    # [D] 모멘텀 (0~12점)
+    momentum_score = np.clip(ret_5d * 0.8, 0, 6.0) + np.clip(ret_20d * 0.4, 0, 6.0)
+
+    # [E] 펀더멘털 (0~10점)
+    fund_score = np.where((pbr > 0) & (pbr < 1.5), np.fmax(0, 10.0 - pbr * 6.67), 0.0)
+
+    # [F] 가격 위치 (0~10점)
+    ma20_gap = np.where(ma20 > 0, (close - ma20) / ma20 * 100, 0.0)
+    position_score = np.select(
+        [(ma20_gap > 0) & (ma20_gap <= 5), ma20_gap > 5],
+        [np.minimum(5.0, ma20_gap * 1.5), np.fmax(0, 5.0 - (ma20_gap - 5) * 0.5)], 0.0,
+    )
+    from_high = np.where(high_60d > 0, close / high_60d * 100, 0.0)
+    high_conds = [from_high >= 95, from_high >= 85]
+    high_pts = [5.0, 3.0 + (from_high - 85) * 0.2]
+    if app_rules:
+        high_conds.append(from_high >= 70)
+        high_pts.append(1.0)
+    position_score = position_score + np.select(high_conds, high_pts, 0.0)
+
+    # 종합
+    raw_score = sector_score + supply_score + tech_score + momentum_score + fund_score + position_score
+    scores = np.round(np.minimum(100.0, raw_score), 1)
+
+    # ATR 기반 목표/손절 — 현재가보다 낮은 후보(ATR 2배, 20일선) 중 높은 값, 없으면 -5%
+    atr_stop = np.trunc(close - atr * 2.0)
+    ma_stop = np.trunc(ma20)
+    stop_loss = np.fmax(np.where(atr_stop < close, atr_stop, np.nan),
+                        np.where(ma_stop < close, ma_stop, np.nan))
+    stop_loss = np.where(np.isnan(stop_loss), np.trunc(close * 0.95), stop_loss)
+
+    risk = close - stop_loss
+    target_price = np.trunc(close + risk * 2.0)
+    target_price = np.where((target_price - close) / close < 0.05, np.trunc(close * 1.05), target_price)
+
+    parts = {
+        "sector": sector_score, "supply": supply_score, "tech": tech_score,
+        "momentum": momentum_score, "fund": fund_score, "position": position_score,
+        "ma20_gap": ma20_gap, "from_high": from_high,
+    }
+    return scores, target_price, stop_loss, parts
+
+
+def explain(f, app_rules=False):
+    """점수 계산이 끝난 종목 하나의 태그와 상세 코멘트 생성
+
+    f: 종목 피처 + 점수(score, target_price, stop_loss, 항목별 점수)를 담은 dict
+    app_rules=True면 앱 전용 태그(RSI강세/RSI과열/5일+)와 앱의 주도섹터 문구를 쓴다.
+    """
+    close, open_p = f["close"], f["open_p"]
+    ma5, ma20, ma60 = f["ma5"], f["ma20"], f["ma60"]
+    vol_ratio, rsi_val, daily_chg = f["vol_ratio"], f["rsi"], f["daily_chg"]
+    ret_5d, ret_20d = f["ret_5d"], f["ret_20d"]
+    high_60d, from_high, ma20_gap = f["high_60d"], f["from_high"], f["ma20_gap"]
+    f_amount, i_amount = f["f_amt"], f["i_amt"]
+    is_foreign_buy, is_inst_buy, is_indi_sell = f["is_f_buy"], f["is_i_buy"], f["is_indi_sell"]
+    pbr, div_yield, sector = f["pbr"], f["div_yield"], f["sector"]
+    score, target_price, stop_loss = f["score"], f["target_price"], f["stop_loss"]
+    sector_score, supply_score, tech_score = f["sector_score"], f["supply_score"], f["tech_score"]
+    momentum_score, fund_score = f["momentum_score"], f["fund_score"]
+
+    body_len, upper_tail = f["body_len"], f["upper_tail"]
+    has_ma60 = f["n_days"] >= 60
+    golden_cross = has_ma60 and (ma5 > ma20 > ma60)
+    target_rate = round((target_price - close) / close * 100, 1)
+    stop_rate = round((stop_loss - close) / close * 100, 1)
+
+    # ── 태그 ──
+    tags = []
+    sector_comments = []
+    if f["in_leading"]:
+        tags.append("주도섹터")
+        if app_rules:
+            sector_comments.append(f"현재 시장 주도 업종인 '{sector}' 섹터에 포함되어 있어 수급 유입이 기대됩니다.")
+        else:
+            sector_comments.append(f"현재 시장 주도 업종인 '{sector}' 섹터에 포함.")
+    if is_foreign_buy and is_inst_buy:
+        tags.append("쌍끌이")
+    elif is_foreign_buy:
+        tags.append("외인수급")
+    elif is_inst_buy:
+        tags.append("기관수급")
+    if is_indi_sell:
+        tags.append("개인매도")
+    if golden_cross:
+        tags.append("정배열")
+    if vol_ratio >= 1.5:
+        tags.append(f"거래량급증({vol_ratio:.1f}배)")
+    if 30 <= rsi_val <= 45:
+        tags.append(f"RSI눌림목({rsi_val:.0f})")
+    elif app_rules and 50 <= rsi_val <= 70:
+        tags.append(f"RSI강세({rsi_val:.0f})")
+    elif app_rules and rsi_val > 75:
+        tags.append(f"RSI과열({rsi_val:.0f})")
+    if app_rules and ret_5d > 5:
+        tags.append(f"5일+{ret_5d:.1f}%")
+    if 0 < pbr < 1.0:
+        tags.append(f"PBR{pbr:.1f}")
+    if high_60d > 0 and from_high >= 95:
+        tags.append("고점돌파임박")
+
+    # ═══ 종합 AI 분석 코멘트 생성 (상세 버전) ═══
+    # ── 1. 종합 판정 헤더 ──
+    if score >= 60:
+        grade = "매우 강력한 매수 시그널"
+        grade_desc = "수급, 기술적 분석, 펀더멘털 모두 긍정적이며, 단기 스윙 트레이딩에 최적의 타이밍입니다."
+    elif score >= 45:
+        grade = "강한 매수 시그널"
+        grade_desc = "주요 지표들이 상승을 지지하고 있으며, 리스크 대비 기대수익이 우수합니다."
+    elif score >= 30:
+        grade = "관심 종목 (조건부 매수)"
+        grade_desc = "일부 지표가 긍정적이나, 추가 확인이 필요한 구간입니다. 분할 매수를 권장합니다."
+    else:
+        grade = "모니터링 단계"
+        grade_desc = "아직 확실한 시그널이 형성되지 않았으나, 추세 전환 시 빠르게 진입할 수 있도록 관찰이 필요합니다."
+
+    sections = []
+    sections.append(f"**[{grade}]** {grade_desc}")
+
+    # ── 2. 섹터 분석 ──
+    if sector_comments:
+        sections.append(f"\n**▶ 섹터 분석 ({sector_score:.0f}점)**: {' '.join(sector_comments)} 시장의 자금 흐름이 해당 업종으로 집중되고 있어, 업종 내 다른 종목 대비 초과 수익이 기대됩니다.")
+    elif sector:
+        sections.append(f"\n**▶ 섹터 분석**: '{sector}' 업종에 속해 있으나, 현재 수급 주도 섹터에는 포함되지 않았습니다. 개별 종목의 모멘텀에 집중할 필요가 있습니다.")
+
+    # ── 3. 수급 분석 ──
+    supply_detail = f"\n**▶ 수급 분석 ({supply_score:.1f}점)**: "
+    if is_foreign_buy and is_inst_buy:
+        supply_detail += f"외국인({f_amount/1e8:+,.0f}억)과 기관({i_amount/1e8:+,.0f}억)이 동시에 순매수하는 '쌍끌이' 패턴이 확인되었습니다. 이는 대형 투자 주체들이 동시에 이 종목에 확신을 갖고 진입하고 있다는 강력한 시그널입니다."
+        if is_indi_sell:
+            supply_detail += " 동시에 개인 투자자가 매도하고 있어, 전형적인 '세력 매집 → 개인 이탈' 구조가 형성되었습니다. 역사적으로 이 패턴은 단기 상승 확률이 높습니다."
+    elif is_foreign_buy:
+        supply_detail += f"외국인이 {f_amount/1e8:+,.0f}억원을 순매수하고 있습니다. 외국인은 글로벌 자금 흐름과 환율을 고려하여 움직이기 때문에, 이들의 매수세는 중장기 상승의 선행 지표로 작용하는 경우가 많습니다."
+        if is_indi_sell:
+            supply_detail += " 개인 매도 물량을 외국인이 흡수하며 수급 개선이 진행 중입니다."
+    elif is_inst_buy:
+        supply_detail += f"기관이 {i_amount/1e8:+,.0f}억원을 순매수하고 있습니다. 기관은 리서치 기반으로 투자하기 때문에, 펀더멘털 개선이나 실적 모멘텀을 선반영하고 있을 가능성이 높습니다."
+        if is_indi_sell:
+            supply_detail += " 개인 물량을 기관이 받아내는 긍정적 손바뀜이 진행 중입니다."
+    else:
+        supply_detail += "당일 뚜렷한 수급 주체가 확인되지 않았습니다. 기술적 지표 위주로 판단하는 것이 적절합니다."
+    sections.append(supply_detail)
+
+    # ── 4. 기술적 분석 ──
+    tech_detail = f"\n**▶ 기술적 분석 ({tech_score:.1f}점)**:\n"
+    tech_items = []
+
+    if golden_cross:
+        spread = (close - ma60) / ma60 * 100 if ma60 > 0 else 0
+        tech_items.append(f"• **이동평균선 정배열**: 5일선({ma5:,.0f}) > 20일선({ma20:,.0f}) > 60일선({ma60:,.0f})으로 완벽한 정배열 상태입니다. 60일선 대비 +{spread:.1f}% 이격되어 있으며, 이는 중기 상승 추세가 건재함을 의미합니다.")
+    elif close > ma20 and ma5 > ma20:
+        item = f"• **골든크로스 임박**: 5일선({ma5:,.0f})이 20일선({ma20:,.0f}) 위에 위치하며 상향 추세를 형성하고 있습니다."
+        if has_ma60:
+            item += f" 60일선({ma60:,.0f}) 돌파 시 본격적인 상승 추세로 전환될 수 있습니다."
+        tech_items.append(item)
+    elif close > ma20:
+        tech_items.append(f"• **20일선 지지**: 현재가({close:,}원)가 20일 이동평균선({ma20:,.0f}원) 위에 있어 단기 지지가 유효합니다.")
+    else:
+        tech_items.append(f"• **이동평균선**: 현재가({close:,}원)가 20일선({ma20:,.0f}원) 하단에 위치해 있어, 이평선 회복 여부를 주시해야 합니다.")
+
+    if vol_ratio >= 2.0:
+        tech_items.append(f"• **거래량 폭증**: 20일 평균 대비 {vol_ratio:.1f}배로 거래량이 폭발적으로 증가했습니다. 이는 새로운 매수세가 대거 유입되고 있음을 의미하며, 추세 전환 또는 강화의 강력한 신호입니다.")
+    elif vol_ratio >= 1.5:
+        tech_items.append(f"• **거래량 급증**: 20일 평균 대비 {vol_ratio:.1f}배의 거래량이 발생했습니다. 평소보다 높은 거래 참여도는 가격 방향성에 대한 시장의 확신을 반영합니다.")
+    elif vol_ratio >= 1.2:
+        tech_items.append(f"• **거래량 소폭 증가**: 20일 평균 대비 {vol_ratio:.1f}배로 다소 활발한 거래가 이루어지고 있습니다.")
+    else:
+        tech_items.append(f"• **거래량**: 20일 평균 대비 {vol_ratio:.1f}배로 평이한 수준입니다. 거래량 동반 없는 상승은 지속성에 의문이 있을 수 있습니다.")
+
+    if rsi_val <= 30:
+        tech_items.append(f"• **RSI {rsi_val:.0f} (과매도)**: 극단적 과매도 영역에 진입하여 기술적 반등 가능성이 높습니다. 다만, 추세적 하락 중 과매도가 지속될 수 있으므로 거래량 반등을 동반하는지 확인이 필요합니다.")
+    elif rsi_val <= 45:
+        tech_items.append(f"• **RSI {rsi_val:.0f} (눌림목)**: 과매도 구간을 벗어나 반등을 모색하는 '눌림목' 구간입니다. 스윙 트레이딩의 교과서적인 매수 타이밍에 해당하며, 리스크 대비 기대수익이 높은 구간입니다.")
+    elif rsi_val <= 60:
+        tech_items.append(f"• **RSI {rsi_val:.0f} (중립~강세)**: 과열 없이 건전한 상승 추세를 유지하고 있습니다. 추가 상승 여력이 충분한 구간입니다.")
+    elif rsi_val <= 75:
+        tech_items.append(f"• **RSI {rsi_val:.0f} (강세)**: 강한 상승 모멘텀이 유지되고 있으나, 70 이상에서는 차익실현 매물이 나올 수 있어 분할 매수/매도 전략이 권장됩니다.")
+    else:
+        tech_items.append(f"• **RSI {rsi_val:.0f} (과매수 주의)**: RSI가 75를 넘어 과매수 영역에 진입했습니다. 단기적으로 조정 가능성이 있으며, 신규 진입보다는 기존 보유자의 일부 차익실현이 적절할 수 있습니다.")
+
+    if daily_chg > 5 and body_len > upper_tail * 2:
+        tech_items.append(f"• **캔들 패턴 (장대양봉)**: 전일 대비 +{daily_chg:.1f}% 상승하며 강한 장대양봉이 형성되었습니다. 매수세가 장중 내내 지속되었음을 의미하며, 향후 추가 상승 모멘텀이 기대됩니다.")
+    elif daily_chg > 2 and close > open_p:
+        tech_items.append(f"• **캔들 패턴 (양봉)**: 전일 대비 +{daily_chg:.1f}% 상승하며 안정적인 양봉이 형성되었습니다.")
+    elif upper_tail > body_len * 2 and daily_chg > 0:
+        tech_items.append(f"• **캔들 패턴 (윗꼬리)**: 장중 매물대를 테스트했으나 소화 과정으로 보이며, 돌파 시도가 진행 중입니다.")
+
+    tech_detail += "\n".join(tech_items)
+    sections.append(tech_detail)
+
+    # ── 5. 모멘텀 분석 ──
+    momentum_detail = f"\n**▶ 모멘텀 분석 ({momentum_score:.1f}점)**: "
+    if ret_5d > 5 and ret_20d > 10:
+        momentum_detail += f"5일 수익률 +{ret_5d:.1f}%, 20일 수익률 +{ret_20d:.1f}%로 단기·중기 모멘텀이 모두 매우 강합니다. 상승 추세가 가속화되고 있으며, 추세 추종 매매에 유리합니다."
+    elif ret_5d > 3:
+        momentum_detail += f"5일 수익률 +{ret_5d:.1f}%로 단기 모멘텀이 양호합니다. 20일 수익률은 {ret_20d:+.1f}%입니다."
+    elif ret_5d > 0:
+        momentum_detail += f"5일 수익률 +{ret_5d:.1f}%, 20일 수익률 {ret_20d:+.1f}%로 완만한 상승세를 보이고 있습니다."
+    else:
+        momentum_detail += f"5일 수익률 {ret_5d:+.1f}%로 단기 조정 국면입니다. 20일 수익률({ret_20d:+.1f}%)을 감안하면 눌림목 매수 기회일 수 있습니다."
+    sections.append(momentum_detail)
+
+    # ── 6. 펀더멘털 ──
+    fund_detail = f"\n**▶ 펀더멘털 ({fund_score:.1f}점)**: "
+    if pbr > 0:
+        if pbr < 0.7:
+            fund_detail += f"PBR {pbr:.2f}배로 자산가치 대비 심하게 저평가되어 있습니다. 청산가치보다 시가총액이 낮은 상태로, 하방 경직성이 매우 높습니다."
+        elif pbr < 1.0:
+            fund_detail += f"PBR {pbr:.2f}배로 자산가치 대비 저평가 영역입니다. 가치투자 관점에서도 매력적인 구간입니다."
+        elif pbr < 2.0:
+            fund_detail += f"PBR {pbr:.2f}배로 적정 수준입니다."
+        else:
+            fund_detail += f"PBR {pbr:.2f}배로 다소 높은 밸류에이션입니다. 성장성이 뒷받침되는지 확인이 필요합니다."
+    else:
+        fund_detail += "PBR 데이터를 확인할 수 없습니다."
+    if div_yield > 0:
+        fund_detail += f" 배당수익률 {div_yield:.1f}%로 {'매력적인 배당 수익' if div_yield >= 3 else '소폭의 배당 수익'}이 추가됩니다."
+    sections.append(fund_detail)
+
+    # ── 7. 가격 위치 & 매매 전략 ──
+    strategy = f"\n**▶ 매매 전략**: "
+    strategy += f"목표가 {target_price:,}원(+{target_rate:.1f}%), 손절가 {stop_loss:,}원({stop_rate:.1f}%)으로 "
+    rr_ratio = abs(target_rate / stop_rate) if stop_rate != 0 else 0
+    strategy += f"손익비 1:{rr_ratio:.1f}입니다. "
+
+    if high_60d > 0:
+        if from_high >= 95:
+            strategy += f"현재 60일 고점({high_60d:,.0f}원) 대비 {from_high:.0f}% 수준으로 고점 돌파를 시도하고 있어, 돌파 시 급등 가능성이 있습니다. "
+        elif from_high >= 85:
+            strategy += f"60일 고점({high_60d:,.0f}원) 대비 {from_high:.0f}% 수준으로 고점까지 여유가 있어 추가 상승 여력이 충분합니다. "
+
+    if ma20_gap > 0:
+        strategy += f"20일선 대비 +{ma20_gap:.1f}% 이격 중이며, "
+        if ma20_gap <= 3:
+            strategy += "이평선 근접 매수로 손절 리스크가 낮은 구간입니다."
+        elif ma20_gap <= 7:
+            strategy += "적정 이격 구간에서 상승 추세를 유지하고 있습니다."
+        else:
+            strategy += "이격이 다소 벌어져 있어 단기 조정 시 추가 매수 전략이 유효합니다."
+    else:
+        strategy += f"20일선 하단({ma20_gap:+.1f}%)에 위치해 있어, 이평선 회복 확인 후 진입이 안전합니다."
+    sections.append(strategy)
+
+    full_reason = "\n".join(sections)
+    return tags, full_reason
+
+
+# ═══════════════════════════════════════
+# 스윙 분석 실행
+# ═══════════════════════════════════════
+def _aligned(df, col, tickers):
+    """df[col]을 tickers 순서로 정렬한 float 배열 (없는 종목은 0)"""
+    if df.empty or col not in df.columns:
+        return np.zeros(len(tickers))
+    return df[col].reindex(tickers).fillna(0).to_numpy(dtype=np.float64)
+
+
+def sector_columns(ticker_map, tickers, leading_sectors):
+    """종목 축으로 정렬한 (업종명 배열, 주도 섹터 여부 bool 배열) — 매핑에 없는 종목은 업종 ''"""
+    if ticker_map.empty or "Sector" not in ticker_map.columns:
+        sector = pd.Series("", index=tickers, dtype=object)
+    else:
+        sector_map = ticker_map["Sector"]
+        sector_map = sector_map[~sector_map.index.duplicated(keep="last")]
+        sector = sector_map.reindex(tickers).fillna("")
+    return sector.to_numpy(), sector.isin(list(leading_sectors)).to_numpy()
+
+
+def score_frame(feat, name_of, app_rules=False):
+    """종목 피처 테이블(index=ticker)을 한 번에 채점해 점수 컷 통과 종목의 결과 DataFrame으로 변환
+
+    feat: panel_features 컬럼 + f_amt/i_amt/is_f_buy/is_i_buy/is_indi_sell/sector/in_leading/pbr/div_yield
+    name_of: ticker → 종목명
+    app_rules: 앱 전용 가점/태그 사용 여부 (score_all, explain 참고)
+    반환: 스윙점수 내림차순 결과 DataFrame (통과 종목이 없으면 빈 DataFrame)
+    """
+    cols = {c: feat[c].to_numpy() for c in feat.columns}
+    scores, target_price, stop_loss, parts = score_all(
+        cols["close"], cols["open_p"], cols["body_len"], cols["upper_tail"], cols["ma5"], cols["ma20"], cols["ma60"],
+        cols["vol_ratio"], cols["rsi"], cols["daily_chg"], cols["ret_5d"], cols["ret_20d"],
+        cols["high_60d"], cols["atr"], cols["n_days"],
+        cols["f_amt"], cols["i_amt"], cols["is_f_buy"], cols["is_i_buy"], cols["is_indi_sell"],
+        cols["in_leading"], cols["pbr"], app_rules=app_rules,
+    )
+
+    # 점수 컷 통과 종목만 남기고, 이후 모든 컬럼은 같은 인덱스 배열로 잘라 쓴다
+    kept = np.flatnonzero(scores >= MIN_SCORE)
+    if kept.size == 0:
+        return pd.DataFrame()
+    rows = {c: v[kept] for c, v in cols.items()}
+    rows.update({
+        "score": scores[kept],
+        "target_price": target_price[kept].astype(np.int64),
+        "stop_loss": stop_loss[kept].astype(np.int64),
+        "sector_score": parts["sector"][kept], "supply_score": parts["supply"][kept],
+        "tech_score": parts["tech"][kept], "momentum_score": parts["momentum"][kept],
+        "fund_score": parts["fund"][kept], "ma20_gap": parts["ma20_gap"][kept], "from_high": parts["from_high"][kept],
+    })
+
+    # 태그/코멘트는 문장 생성이라 통과 종목만 한 행씩
+    explained = [explain({c: v[j] for c, v in rows.items()}, app_rules=app_rules) for j in range(kept.size)]
+
+    # 컬럼마다 dtype을 정해 둔 1차원 배열로 한 번에 구성 (태그는 리스트를 원소로 갖는 object 배열)
+    tickers = feat.index.to_numpy(dtype=object)[kept]
+    tag_col = np.empty(kept.size, dtype=object)
+    tag_col[:] = [tags for tags, _ in explained]
+    close = rows["close"]
+    df_result = pd.DataFrame({
+        "종목명": np.array([name_of(t) for t in tickers], dtype=object),
+        "현재가": close,
+        "등락률": np.round(rows["daily_chg"], 2),
+        "스윙점수": rows["score"],
+        "추천사유": np.array([reason for _, reason in explained], dtype=object),
+        "태그": tag_col,
+        "목표가": rows["target_price"],
+        "목표수익률": np.round((rows["target_price"] - close) / close * 100, 1),
+        "손절가": rows["stop_loss"],
+        "손절수익률": np.round((rows["stop_loss"] - close) / close * 100, 1),
+        "PBR": rows["pbr"], "배당수익률": rows["div_yield"],
+        "Code": tickers, "RSI": np.round(rows["rsi"], 1),
+        "Sector": rows["sector"].astype(object),
+    })
+    return df_result.sort_values("스윙점수", ascending=False)
+
+
+def compute_swing(target_date, panel, df_foreign, df_inst, df_indi, df_fund, ticker_map, leading_sectors):
+    """일봉 패널과 수급/펀더멘털/섹터 데이터로 스윙 점수 결과 계산
+
+    반환: (df_result, top_picks) — 결과가 없으면 (빈 DataFrame, [])
+    """
+    # CPU 단계: 패널 전체를 행렬로 쌓아 종목 축 벡터 연산 (종목별 루프/프로세스 풀 불필요)
+    tickers, mats = stack_panel(panel)
+    if not tickers:
+        return pd.DataFrame(), []
+    feat = panel_features(tickers, mats)
+
+    # 종목 축으로 정렬된 피처 테이블 + 수급/섹터/펀더멘털 정보
+    feat["f_amt"] = _aligned(df_foreign, '순매수거래대금', tickers)
+    feat["i_amt"] = _aligned(df_inst, '순매수거래대금', tickers)
+    feat["is_f_buy"] = _aligned(df_foreign, "순매수거래량", tickers) > 0
+    feat["is_i_buy"] = _aligned(df_inst, "순매수거래량", tickers) > 0
+    feat["is_indi_sell"] = _aligned(df_indi, "순매수거래량", tickers) < 0
+    feat["sector"], feat["in_leading"] = sector_columns(ticker_map, tickers, leading_sectors)
+    feat["pbr"] = _aligned(df_fund, "PBR", tickers)
+    feat["div_yield"] = _aligned(df_fund, "DIV", tickers)
+
+    df_result = score_frame(feat, stock.get_market_ticker_name)
+    if df_result.empty:
+        return pd.DataFrame(), []
+
+    top_picks = df_result.head(3).to_dict('records')
+    return df_result, top_picks
@@ -1,9 +1,17 @@
+import concurrent.futures
+import threading
+import time
 import pandas as pd
 from pykrx import stock
 import FinanceDataReader as fdr
 from datetime import datetime, timedelta, timezone
 import streamlit as st
 
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:  # 스크립트 실행 컨텍스트 API가 없는 streamlit 버전
+    add_script_run_ctx = get_script_run_ctx = None
+
 # ═══════════════════════════════════════
 # KST 시간대 유틸 (Streamlit Cloud는 UTC)
 # ═══════════════════════════════════════
@@ -25,20 +33,53 @@ def _safe_pykrx_call(func, *args, **kwargs):
         return None
 
 
-@st.cache_data(ttl=3600*24)
+def _ctx_thread_pool(max_workers):
+    """호출한 스크립트 스레드의 실행 컨텍스트를 워커에 붙인 ThreadPoolExecutor
+
+    워커에서 st.cache_data 함수를 호출해도 "missing ScriptRunContext" 경고 없이 캐시/스피너가 동작하도록
+    (컨텍스트가 없는 호출 — 배치/스레드 — 에서는 일반 ThreadPoolExecutor)
+    """
+    ctx = get_script_run_ctx() if get_script_run_ctx is not None else None
+    if ctx is None:
+        return concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    return concurrent.futures.ThreadPoolExecutor(
+        max_workers=max_workers,
+        initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx),
+    )
+
+
+def _nonempty(df, cols=()):
+    """df가 None이 아니고 행이 있으며 cols 컬럼을 모두 가졌는지"""
+    return df is not None and not df.empty and all(c in df.columns for c in cols)
+
+
 def get_ticker_mapping():
-    """종목코드 -> 종목명, 업종 매핑 데이터"""
+    """종목코드 -> 종목명, 업종 매핑 데이터 (KST 날짜 단위로 디스크 캐시)
+
+    업종 매핑을 만들지 못하면 빈 DataFrame (캐시하지 않으므로 다음 호출에서 다시 시도)
+    """
+    try:
+        return _load_ticker_mapping(_now_kst().strftime("%Y%m%d"))
+    except Exception as e:
+        print(f"[WARN] 종목 매핑 조회 실패: {e}")
+        return pd.DataFrame()
+
+
+# persist="disk"는 ttl을 무시하므로, 날짜 인자를 캐시 키로 삼아 하루 단위로 갱신
+# (앱 재시작/콜드 스타트 후에도 당일 매핑은 디스크에서 바로 로드, 최근 3일치만 보관)
+@st.cache_data(persist="disk", max_entries=3, show_spinner="종목 매핑 불러오는 중...")
+def _load_ticker_mapping(day):
+    """get_ticker_mapping 본체 — day는 캐시 키 전용
+
+    Sector가 없는 결과(모든 소스 실패)는 예외로 올려 디스크에 캐시되지 않게 한다.
+    """
     # 1. FDR KRX-DESC 사용 (Sector/Industry 정보 포함)
     try:
         df = fdr.StockListing("KRX-DESC")
-        cols = ['Code', 'Name']
+        if 'Industry' in df.columns and 'Sector' not in df.columns:
+            df = df.rename(columns={'Industry': 'Sector'})
         if 'Sector' in df.columns:
-            cols.append('Sector')
-        elif 'Industry' in df.columns:
-            df.rename(columns={'Industry': 'Sector'}, inplace=True)
-            cols.append('Sector')
-        
-        return df[cols].set_index('Code')
+            return df[['Code', 'Name', 'Sector']].set_index('Code')
     except:
         pass
 
@@ -54,32 +95,78 @@ def get_ticker_mapping():
         df_base = pd.DataFrame()
 
     # 3. PyKRX를 이용해 업종 정보 채우기 (Fallback)
-    sector_map = {}
+    def _fetch_sector(idx):
+        """업종 지수 하나의 (지수명, 구성종목) — 시장 대표 지수는 None"""
+        idx_name = stock.get_index_ticker_name(idx)
+        if "코스피" in idx_name or "코스닥" in idx_name or "KRX" in idx_name:
+            return None
+        return idx_name, stock.get_index_portfolio_deposit_file(idx)
+
     try:
-        for market in ["KOSPI", "KOSDAQ"]:
-            indices = stock.get_index_listing(market)
-            for idx in indices:
-                idx_name = stock.get_index_ticker_name(idx)
-                if "코스피" in idx_name or "코스닥" in idx_name or "KRX" in idx_name:
-                    continue
-                tickers = stock.get_index_portfolio_deposit_file(idx)
-                for code in tickers:
-                    sector_map[code] = idx_name
-                    
-        df_sector = pd.DataFrame.from_dict(sector_map, orient='index', columns=['Sector'])
-        if not df_base.empty:
-            df_final = df_base.join(df_sector, how='left')
-            df_final['Sector'] = df_final['Sector'].fillna('')
-            return df_final
-        else:
-            return df_sector
-            
-    except Exception:
-        return df_base
+        indices = [idx for market in ["KOSPI", "KOSDAQ"] for idx in stock.get_index_listing(market)]
+        # 지수마다 HTTP 2회 — 스레드로 동시 조회하고, 매핑은 메인 스레드에서 원래 지수 순서대로 만듦
+        with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
+            fetched = [item for item in executor.map(_fetch_sector, indices) if item is not None]
+
+        # (종목코드, 업종) 레코드로 한 번에 구성 — 여러 지수에 속한 종목은 나중 지수 기준 (keep='last')
+        records = [(code, idx_name) for idx_name, tickers in fetched for code in tickers]
+        df_sector = (
+            pd.DataFrame(records, columns=['Code', 'Sector'])
+            .drop_duplicates('Code', keep='last')
+            .set_index('Code')
+        )
+    except Exception as e:
+        raise RuntimeError(f"업종 매핑 생성 실패: {e}") from e
+    if df_sector.empty:
+        raise RuntimeError("업종 매핑 생성 실패: 업종 지수 구성종목 없음")
+
+    if not df_base.empty:
+        df_final = df_base.join(df_sector, how='left')
+        df_final['Sector'] = df_final['Sector'].fillna('')
+        return df_final
+    return df_sector
+
+
+def get_sector_only_mapping():
+    """종목코드 -> 업종 (Sector 한 컬럼만) — 섹터 집계 join용 좁은 매핑
+
+    캐시하지 않음: get_ticker_mapping이 이미 영업일별로 캐시되므로, 여기서 24시간 캐시하면
+    날짜가 바뀐 뒤에도 전날 매핑이 남는다.
+    """
+    mapping = get_ticker_mapping()
+    if mapping is None or mapping.empty:
+        return pd.DataFrame(columns=['Sector'])
+    if 'Sector' not in mapping.columns:
+        return mapping.assign(Sector="")[['Sector']]
+    return mapping[['Sector']]
+
+
+_LBD_SESSION_KEY = "_latest_business_day"
+_LBD_SESSION_TTL = 600
 
 
-@st.cache_data(ttl=3600)
 def get_latest_business_day():
+    """최근 유효 거래일 (YYYYMMDD) — 세션 내에서는 session_state 메모로 바로 반환
+
+    여러 페이지/리런에서 인자 없이 반복 호출되므로 (값, 저장시각)을 세션에 10분 보관하고,
+    만료 시에는 세션 간 공유되는 1시간 캐시(_compute_latest_business_day)에서 다시 가져온다.
+    """
+    now = time.time()
+    cached = st.session_state.get(_LBD_SESSION_KEY)
+    if cached is not None and now - cached[1] < _LBD_SESSION_TTL:
+        return cached[0]
+    value = _compute_latest_business_day()
+    st.session_state[_LBD_SESSION_KEY] = (value, now)
+    return value
+
+
+def clear_latest_business_day():
+    """get_latest_business_day의 세션 메모를 비움 (캐시 초기화 버튼용)"""
+    st.session_state.pop(_LBD_SESSION_KEY, None)
+
+
+@st.cache_data(ttl=3600)
+def _compute_latest_business_day():
     """최근 유효 거래일 (KST 기준, 클라우드 호환)
     - 장중(09:00~15:40 평일): 오늘 날짜 우선 시도, 데이터 없으면 전일 fallback
     - 장 마감 후 / 주말: 가장 최근 거래일 반환
@@ -104,31 +191,22 @@ def get_latest_business_day():
     elif date.weekday() == 6:
         date -= timedelta(days=2)
 
-    # pykrx로 데이터 유무 확인 (최대 7일)
-    for _ in range(7):
-        str_date = date.strftime("%Y%m%d")
-        try:
-            df = stock.get_index_ohlcv(str_date, str_date, "1001")
-            if df is not None and not df.empty:
-                return str_date
-        except:
-            pass
-
-        # FDR fallback 체크
-        try:
-            fdr_date = date.strftime("%Y-%m-%d")
-            df = fdr.DataReader("KS11", fdr_date, fdr_date)
-            if df is not None and not df.empty:
-                return str_date
-        except:
-            pass
+    # 최근 10일 KOSPI 지수를 한 번에 조회해 마지막 거래일 선택 (연휴가 길어도 요청 1회)
+    start = date - timedelta(days=10)
+    try:
+        df = stock.get_index_ohlcv(start.strftime("%Y%m%d"), date.strftime("%Y%m%d"), "1001")
+        if df is not None and not df.empty:
+            return df.index.max().strftime("%Y%m%d")
+    except Exception:
+        pass
 
-        date -= timedelta(days=1)
-        # 주말 건너뛰기
-        if date.weekday() == 6:
-            date -= timedelta(days=2)
-        elif date.weekday() == 5:
-            date -= timedelta(days=1)
+    # FDR fallback (같은 구간)
+    try:
+        df = fdr.DataReader("KS11", start.strftime("%Y-%m-%d"), date.strftime("%Y-%m-%d"))
+        if df is not None and not df.empty:
+            return df.index.max().strftime("%Y%m%d")
+    except Exception:
+        pass
 
     # 최종 Fallback
     date = now - timedelta(days=1)
@@ -157,14 +235,11 @@ def get_kospi_chart_data(days=60):
         end_fdr = now.strftime("%Y-%m-%d")
         df = fdr.DataReader("KS11", start_fdr, end_fdr)
         if df is not None and not df.empty:
-            df = df.rename(columns={
+            # 한글 컬럼명 + 등락률 컬럼 추가 (pykrx 호환) — FDR에는 '등락률'이 없으므로 항상 계산
+            return df.rename(columns={
                 'Open': '시가', 'High': '고가', 'Low': '저가',
                 'Close': '종가', 'Volume': '거래량'
-            })
-            # 등락률 컬럼 추가 (pykrx 호환)
-            if '등락률' not in df.columns and '종가' in df.columns:
-                df['등락률'] = df['종가'].pct_change() * 100
-            return df
+            }).assign(등락률=lambda d: d['종가'].pct_change().mul(100))
     except Exception:
         pass
     
@@ -187,7 +262,39 @@ def _get_cache_ttl():
     from utils.krx_realtime import is_market_open
     return 180 if is_market_open() else 600
 
-@st.cache_data(ttl=180)
+@st.cache_data(ttl=600, max_entries=32)
+def _get_ohlcv_with_sector(date, market="KOSPI"):
+    """전종목 등락률 + 종목명/업종 (index=티커)
+
+    투자자 구분과 무관하므로 외국인/기관 순매수 조회가 이 결과 하나를 공유한다.
+    등락률 조회에 실패하면 '등락률' 컬럼 없이, 매핑이 없으면 '종목명' 없이 반환.
+    """
+    frames = []
+    try:
+        df_ohlcv = stock.get_market_ohlcv(date, market=market)
+        if _nonempty(df_ohlcv, ('등락률',)):
+            frames.append(df_ohlcv[['등락률']])
+    except Exception:
+        pass
+
+    mapping = get_ticker_mapping()
+    if _nonempty(mapping):
+        info = mapping[[c for c in ('Name', 'Sector') if c in mapping.columns]].rename(columns={'Name': '종목명'})
+        if 'Sector' not in info.columns:
+            info = info.assign(Sector="")
+        frames.append(info)
+
+    if not frames:
+        return pd.DataFrame()
+    merged = frames[0]
+    for frame in frames[1:]:
+        merged = merged.join(frame, how='outer')
+    return merged
+
+
+# 날짜별 캐시 키 — 과거 날짜를 훑어도 메모리가 무한정 늘지 않도록 항목 수 상한 (LRU)
+#   (날짜 × 시장 × 투자자 × top_n 조합으로 한 달치 영업일 정도를 커버)
+@st.cache_data(ttl=180, max_entries=64)
 def get_market_net_purchases(date, market="KOSPI", investor="외국인", top_n=30):
     """일자별 순매수/순매도 데이터
     - 장중: KRX 직접 API → Naver Finance fallback
@@ -201,59 +308,36 @@ def get_market_net_purchases(date, market="KOSPI", investor="외국인", top_n=3
     # ── 1순위: KRX 직접 API (장중/마감 모두 시도) ──
     try:
         df = get_realtime_net_purchases(date, market, investor)
-        if df is not None and not df.empty:
+        if _nonempty(df):
             data_source = "krx_realtime"
     except Exception:
         pass
 
     # ── 2순위: pykrx (마감 후 확정 데이터) ──
-    if df is None or df.empty:
+    if not _nonempty(df):
         try:
             df = stock.get_market_net_purchases_of_equities(date, date, market, investor)
-            if df is not None and not df.empty:
+            if _nonempty(df):
                 data_source = "pykrx"
         except Exception:
             pass
 
-    if df is None or df.empty:
+    if not _nonempty(df):
         return pd.DataFrame()
 
     # ── 데이터 정규화 (소스에 따라 컬럼명 통일) ──
     df = df.sort_values(by="순매수거래대금", ascending=False)
 
-    # 등락률 정보 추가 (없는 경우)
+    # 등락률/종목명/업종 보강: 투자자와 무관한 부분은 캐시된 공용 프레임에서 빠진 컬럼만 join
+    #   (KRX API에서 이미 제공하는 컬럼은 스킵)
+    extra = _get_ohlcv_with_sector(date, market)
+    missing = [c for c in ('등락률', '종목명', 'Sector') if c not in df.columns and c in extra.columns]
+    if missing:
+        df = df.join(extra[missing], how='left')
     if '등락률' not in df.columns:
-        try:
-            df_ohlcv = stock.get_market_ohlcv(date, market=market)
-            if df_ohlcv is not None and not df_ohlcv.empty and '등락률' in df_ohlcv.columns:
-                df = df.join(df_ohlcv[['등락률']], how='left')
-            else:
-                df['등락률'] = 0.0
-        except:
-            df['등락률'] = 0.0
-
-    # 종목명 추가 (KRX API에서 이미 제공하는 경우 스킵)
-    if '종목명' not in df.columns:
-        try:
-            mapping = get_ticker_mapping()
-            if mapping is not None and not mapping.empty:
-                if 'Name' in mapping.columns:
-                    df = df.join(mapping[['Name']], how='left')
-                    df = df.rename(columns={'Name': '종목명'})
-        except:
-            pass
-
-    # 종목명, 업종 매핑
-    mapping = get_ticker_mapping()
-
-    if mapping is not None and not mapping.empty:
-        if 'Sector' not in mapping.columns:
-            mapping['Sector'] = ""
-        if 'Sector' not in df.columns:
-            df = df.join(mapping[['Sector']], how='left')
-    else:
-        if 'Sector' not in df.columns:
-            df['Sector'] = ""
+        df['등락률'] = 0.0
+    if 'Sector' not in df.columns:
+        df['Sector'] = ""
 
     # 컬럼 정제
     cols = ['종목명', 'Sector', '순매수거래대금', '등락률']
@@ -267,26 +351,43 @@ def get_market_net_purchases(date, market="KOSPI", investor="외국인", top_n=3
         return result.head(top_n)
     return result
 
-@st.cache_data(ttl=600)
+
+def get_market_net_purchases_multi(date, market="KOSPI", investors=("외국인", "기관합계", "개인"), top_n=None):
+    """여러 투자자의 순매수 데이터를 한 번에 조회 → {투자자: DataFrame}
+
+    투자자별 조회는 서로 독립적인 네트워크 대기라 동시에 요청한다. 투자자와 무관한 공용 등락률/업종
+    프레임은 먼저 메인 스레드에서 캐시에 올려 두어, 워커들은 캐시 적중으로 바로 가져간다
+    (백엔드 버전이 extra로 한 번만 만들어 넘기는 것과 같은 흐름)
+    """
+    _get_ohlcv_with_sector(date, market)
+    with _ctx_thread_pool(len(investors)) as executor:
+        futures = {
+            inv: executor.submit(get_market_net_purchases, date, market, inv, top_n=top_n)
+            for inv in investors
+        }
+        return {inv: fut.result() for inv, fut in futures.items()}
+
+@st.cache_data(ttl=600, max_entries=32)
 def get_leading_sectors(date, market="KOSPI", top_n=5):
     """Top-Down 분석: 외국인/기관 수급 주도 섹터 추출"""
     try:
-        df_foreign = get_market_net_purchases(date, market, "외국인", top_n=None)
-        if not df_foreign.empty and 'Sector' in df_foreign.columns:
-            sector_foreign = df_foreign.groupby('Sector')['순매수거래대금'].sum().sort_values(ascending=False)
-            top_foreign_sectors = set(sector_foreign.head(top_n).index)
-        else:
-            top_foreign_sectors = set()
-            
-        df_inst = get_market_net_purchases(date, market, "기관합계", top_n=None)
-        if not df_inst.empty and 'Sector' in df_inst.columns:
-            sector_inst = df_inst.groupby('Sector')['순매수거래대금'].sum().sort_values(ascending=False)
-            top_inst_sectors = set(sector_inst.head(top_n).index)
-        else:
-            top_inst_sectors = set()
-            
-        leading_sectors = (top_foreign_sectors | top_inst_sectors) - {''}
-        return leading_sectors
+        flows = get_market_net_purchases_multi(date, market, ("외국인", "기관합계"))
+        df_foreign = flows["외국인"]
+        df_inst = flows["기관합계"]
+
+        # 외국인/기관 섹터별 순매수 합계를 투자자 키를 붙여 한 번의 groupby로 집계 후 각각 상위 top_n
+        frames = {
+            inv: df[['Sector', '순매수거래대금']]
+            for inv, df in (("외국인", df_foreign), ("기관합계", df_inst))
+            if _nonempty(df, ('Sector',))
+        }
+        if not frames:
+            return set()
+        sums = pd.concat(frames, names=['inv']).groupby(['inv', 'Sector'])['순매수거래대금'].sum()
+        leading_sectors = set()
+        for inv in frames:
+            leading_sectors |= set(sums.loc[inv].nlargest(top_n).index)
+        return leading_sectors - {''}
         
     except Exception:
         return set()
@@ -300,35 +401,35 @@ def get_global_indices(days=5):
         "SOX": "SOXX"
     }
     
-    result = {}
     now = _now_kst()
     end_date = now.strftime("%Y-%m-%d")
     start_date = (now - timedelta(days=days)).strftime("%Y-%m-%d")
-    
-    for name, symbol in indices.items():
+
+    def _fetch(symbol):
         try:
             df = fdr.DataReader(symbol, start_date, end_date)
-            if df is not None and not df.empty:
-                result[name] = df
-        except:
-            continue
-            
-    return result
+        except Exception:
+            return None
+        return df if df is not None and not df.empty else None
 
-@st.cache_data(ttl=600)
+    # 네트워크 대기 위주이므로 지수별 요청을 동시에 보냄 (결과 순서는 indices 순서 유지)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(indices)) as executor:
+        frames = list(executor.map(_fetch, indices.values()))
+
+    return {name: df for name, df in zip(indices, frames) if df is not None}
+
+@st.cache_data(ttl=600, max_entries=32)
 def get_sector_returns(date, market="KOSPI"):
     """섹터별 평균 등락률 계산"""
     try:
         df_price = stock.get_market_ohlcv(date, market=market)
-        df_map = get_ticker_mapping()
-        
-        if df_price is None or df_price.empty or df_map is None or df_map.empty:
-            return pd.Series(dtype=float)
+        df_map = get_sector_only_mapping()
         
-        if '등락률' not in df_price.columns:
+        if not _nonempty(df_price, ('등락률',)) or df_map.empty:
             return pd.Series(dtype=float)
             
-        df_merged = df_price.join(df_map[['Sector']], how='inner')
+        # 집계에 필요한 등락률 한 컬럼만 업종과 join
+        df_merged = df_price[['등락률']].join(df_map, how='inner')
         sector_ret = df_merged.groupby('Sector')['등락률'].mean().sort_values(ascending=False)
         
         if '' in sector_ret.index:
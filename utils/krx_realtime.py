@@ -4,33 +4,75 @@ KRX 실시간 데이터 모듈
 - 장 마감 후(18:00+): pykrx fallback (data_fetcher.py에서 처리)
 """
 import pandas as pd
+import numpy as np
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import lxml.etree
+import lxml.html
 from io import StringIO
 from datetime import datetime, timedelta, timezone
 import re
+import concurrent.futures
+import streamlit as st
+
+try:
+    import orjson
+    _json_loads = orjson.loads  # 전종목 응답(수백 KB) 디코딩이 stdlib json보다 수 배 빠름
+except ImportError:
+    import json
+    _json_loads = json.loads
 
 KST = timezone(timedelta(hours=9))
 
 
+# 실시간 조회 캐시 버킷 — 장중에는 N초 단위, 장외에는 1시간 단위로 키가 바뀜
+#   (마감 직후~18시 확정 전 값이 밤새 남지 않도록 장외에도 1시간마다 새로 조회)
+_CLOSED_BUCKET_SEC = 3600
+_REALTIME_CACHE_TTL = _CLOSED_BUCKET_SEC  # 버킷이 바뀌면 새 키로 조회되므로 ttl은 가장 긴 버킷 길이
+
+
 # ═══════════════════════════════════════
 # 장중 여부 판별
 # ═══════════════════════════════════════
 def is_market_open():
-    """현재 장중인지 판별 (KST 기준 평일 09:00~15:30)"""
-    now = datetime.now(KST)
+    """현재 장중인지 판별 (KST 기준 평일 09:00~15:30)
+
+    시계 확인뿐이라 캐시하지 않음 (캐시하면 장 시작/마감 경계에서 ttl만큼 늦게 바뀜)
+    """
+    now = _now_kst()
     if now.weekday() >= 5:
         return False
-    hour, minute = now.hour, now.minute
-    if hour < 9 or (hour == 15 and minute >= 30) or hour > 15:
-        return False
-    return True
+    return (9, 0) <= (now.hour, now.minute) < (15, 30)
 
 
 def _now_kst():
     return datetime.now(KST)
 
 
+def _cache_bucket(open_sec):
+    """실시간 조회 캐시 키 — 장중에는 open_sec초, 장외에는 _CLOSED_BUCKET_SEC초 단위 구간 번호"""
+    ts = int(_now_kst().timestamp())
+    if is_market_open():
+        return f"open-{ts // open_sec}"
+    return f"closed-{ts // _CLOSED_BUCKET_SEC}"
+
+
+def _make_session(headers):
+    """공용 헤더 + 커넥션 풀을 가진 requests 세션 (호출마다 TCP/TLS 핸드셰이크 방지)
+
+    일시적인 연결 실패는 어댑터에서 짧게 2회 재시도 (0.3s 백오프)
+    """
+    session = requests.Session()
+    session.headers.update(headers)
+    adapter = HTTPAdapter(
+        pool_connections=10, pool_maxsize=20,
+        max_retries=Retry(total=2, backoff_factor=0.3),
+    )
+    session.mount("https://", adapter)
+    return session
+
+
 # ═══════════════════════════════════════
 # Naver Finance 스크래핑 (장중 실시간 — 1순위)
 # ═══════════════════════════════════════
@@ -43,6 +85,17 @@ NAVER_INVESTOR_MAP = {
     "기관합계": "02",
 }
 
+# 매매상위 데이터 테이블: class="type_5" / "type2" / "type_1" 중 문서 순서상 첫 번째
+#   XPath/정규식은 모듈 로드 시 한 번만 컴파일해 페이지마다 재사용
+_NAVER_TABLE_XPATH = lxml.etree.XPath("//table[{}]".format(" or ".join(
+    f"contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')" for cls in ("type_5", "type2", "type_1")
+)))
+_NAVER_NUM_CLEAN_RE = re.compile(r"[\s,+%]")
+_NAVER_CODE_RE = re.compile(r"code=(\d{6})")
+
+# 네이버 요청은 모듈 공용 세션으로 — keep-alive로 매수/매도·투자자별 호출이 TCP/TLS 연결을 재사용
+_NAVER_SESSION = _make_session(NAVER_HEADERS)
+
 
 def _parse_naver_number(text):
     """네이버 숫자 문자열을 float으로 변환 (쉼표, +, - 처리)"""
@@ -55,106 +108,113 @@ def _parse_naver_number(text):
         return 0
 
 
+def _parse_naver_deal_table(table_html, trade_type):
+    """매매상위 테이블 HTML → 종목코드/종목명/순매수거래량/순매수거래대금/현재가 DataFrame
+
+    read_html(extract_links="body")로 셀마다 (텍스트, 링크)를 받아 (행 × 칸) 배열로 한 번에 처리:
+    - 종목 링크(code=XXXXXX)가 있고 td가 4개 이상인 행만 사용, 링크 칸은 숫자에서 제외
+    - 유효 숫자 중 첫 번째가 현재가 (100 이하이면 순위로 보고 두 번째), 끝에서 두 번째가 순매수거래량
+    - sell 페이지는 순매수거래량을 음수로, 순매수거래대금은 거래량 × 현재가로 추정
+    """
+    raw = pd.read_html(StringIO(table_html), flavor="lxml", extract_links="body")[0]
+    n_rows, n_cols = raw.shape
+    cells = pd.Series(raw.to_numpy(dtype=object).ravel())  # (텍스트, href) 튜플, 빈 칸(행 길이 맞춤)은 NaN
+    text, href = cells.str[0], cells.str[1].fillna("")  # 링크 없는 칸은 빈 href
+
+    present = text.notna().to_numpy().reshape(n_rows, n_cols)
+    is_link = href.str.contains("code=", regex=False).to_numpy().reshape(n_rows, n_cols)
+    nums = pd.to_numeric(
+        text.str.replace(_NAVER_NUM_CLEAN_RE, "", regex=True), errors="coerce"
+    ).to_numpy(dtype=float).reshape(n_rows, n_cols)
+    nums[is_link] = np.nan
+    valid = ~np.isnan(nums)
+
+    # 행마다 첫 번째 종목 링크 칸 → 코드/종목명
+    link_col = is_link.argmax(axis=1)
+    rows = np.arange(n_rows)
+    first_href = pd.Series(href.to_numpy().reshape(n_rows, n_cols)[rows, link_col])
+    codes = first_href.str.extract(_NAVER_CODE_RE, expand=False)
+    names = text.to_numpy().reshape(n_rows, n_cols)[rows, link_col]
+
+    # 유효 숫자의 순번(1부터)으로 첫 번째 / 두 번째 / 끝에서 두 번째 값을 위치 인덱싱
+    rank = np.cumsum(valid, axis=1)
+    n_valid = rank[:, -1]
+
+    def _nth(k):
+        return nums[rows, (valid & (rank == k[:, None])).argmax(axis=1)]
+
+    ones = np.ones(n_rows, dtype=int)
+    first, second, second_last = _nth(ones), _nth(ones * 2), _nth(n_valid - 1)
+
+    enough = n_valid >= 4
+    price = np.where(enough, np.where(first > 100, first, second), 0.0)
+    net_vol = np.where(enough, second_last, 0.0)
+    if trade_type == "sell":
+        net_vol = -np.abs(net_vol)
+    net_val = np.where(price != 0, net_vol * price, 0.0)
+
+    keep = (present.sum(axis=1) >= 4) & is_link.any(axis=1) & codes.notna().to_numpy()
+    return pd.DataFrame({
+        "종목코드": codes.to_numpy()[keep],
+        "종목명": names[keep],
+        "순매수거래량": np.trunc(net_vol[keep]).astype(np.int64),
+        "순매수거래대금": np.trunc(net_val[keep]).astype(np.int64),
+        "현재가": np.trunc(price[keep]).astype(np.int64),
+    })
+
+
 def fetch_naver_investor_trading(investor="외국인"):
     """
     네이버증권 투자자별 매매상위 종목 (장중 실시간)
-    BeautifulSoup으로 안정적 파싱
+    lxml로 데이터 테이블만 골라낸 뒤 pandas.read_html + 벡터 연산으로 정리
 
     URL: https://finance.naver.com/sise/sise_deal.naver?sosok={01|02}&type={buy|sell}
     테이블 구조: 종목명(링크포함) | 현재가 | 전일비 | 등락률 | 매도거래량 | 매수거래량 | 순매수거래량 | 거래량
 
+    장중에는 30초, 장외에는 1시간 단위로 캐시. 조회 실패 시 예외 (빈 결과는 캐시하지 않음)
+
     Returns: pykrx 호환 DataFrame
     """
     sosok = NAVER_INVESTOR_MAP.get(investor)
     if not sosok:
         return pd.DataFrame()
+    return _fetch_naver_investor_trading(investor, sosok, _cache_bucket(30))
 
-    all_records = []
 
-    for trade_type in ["buy", "sell"]:
+@st.cache_data(ttl=_REALTIME_CACHE_TTL, max_entries=8, show_spinner=False)
+def _fetch_naver_investor_trading(investor, sosok, bucket):
+    """fetch_naver_investor_trading 본체 — bucket은 캐시 키 전용"""
+    trade_types = ["buy", "sell"]
+
+    def _fetch_page(trade_type):
+        """매수/매도 상위 페이지 하나를 받아 바로 파싱 (워커 스레드에서 실행, 실패 시 None)"""
         url = f"https://finance.naver.com/sise/sise_deal.naver?sosok={sosok}&type={trade_type}"
         try:
-            resp = requests.get(url, headers=NAVER_HEADERS, timeout=10)
+            resp = _NAVER_SESSION.get(url, timeout=10)
             resp.encoding = "euc-kr"
-            soup = BeautifulSoup(resp.text, "lxml")
-
-            # 데이터 테이블 찾기: class="type_5" 또는 "type2"
-            table = soup.select_one("table.type_5, table.type2, table.type_1")
-            if not table:
-                # 모든 테이블 중에서 가장 행이 많은 테이블
-                tables = soup.select("table")
-                table = max(tables, key=lambda t: len(t.select("tr")), default=None)
-
-            if not table:
-                continue
-
-            rows = table.select("tr")
-
-            for row in rows:
-                tds = row.select("td")
-                if len(tds) < 4:
-                    continue
-
-                # 종목명과 코드 추출
-                link = row.select_one("a[href*='code=']")
-                if not link:
-                    continue
-
-                name = link.get_text(strip=True)
-                href = link.get("href", "")
-                code_match = re.search(r"code=(\d{6})", href)
-                if not code_match:
-                    continue
-                code = code_match.group(1)
-
-                # 숫자 데이터 추출 (td 요소들)
-                nums = []
-                for td in tds:
-                    text = td.get_text(strip=True).replace(",", "").replace("+", "").replace("%", "")
-                    # 종목명 td 건너뛰기
-                    if td.select_one("a[href*='code=']"):
-                        continue
-                    try:
-                        nums.append(float(text))
-                    except (ValueError, TypeError):
-                        nums.append(None)
-
-                # nums 순서: [현재가, 전일비, 등락률, 매도거래량, 매수거래량, 순매수거래량, 거래량]
-                # 또는: [순위, 현재가, 전일비, 등락률, ...]
-                price = 0
-                net_vol = 0
-                change_pct = 0
-
-                # 유효한 숫자만 필터
-                valid_nums = [n for n in nums if n is not None]
-
-                if len(valid_nums) >= 4:
-                    # 첫 번째 큰 숫자가 현재가 (보통 수천~수십만)
-                    # 마지막에서 두 번째가 순매수거래량
-                    price = valid_nums[0] if valid_nums[0] and valid_nums[0] > 100 else (valid_nums[1] if len(valid_nums) > 1 else 0)
-                    net_vol = valid_nums[-2] if len(valid_nums) >= 2 else 0
-
-                if trade_type == "sell":
-                    net_vol = -abs(net_vol) if net_vol else 0
-
-                # 순매수거래대금 추정 (거래량 * 현재가)
-                net_val = net_vol * price if price else 0
-
-                all_records.append({
-                    "종목코드": code,
-                    "종목명": name,
-                    "순매수거래량": int(net_vol),
-                    "순매수거래대금": int(net_val),
-                    "현재가": int(price) if price else 0,
-                })
+
+            # 페이지 파싱은 lxml(C)로 한 번, DataFrame 변환은 데이터 테이블 하나만
+            tables = _NAVER_TABLE_XPATH(lxml.html.fromstring(resp.text))
+            if not tables:
+                print(f"[Naver] 데이터 테이블 없음 ({investor}/{trade_type})")
+                return None
+
+            table_html = lxml.html.tostring(tables[0], encoding="unicode")
+            return _parse_naver_deal_table(table_html, trade_type)
 
         except Exception as e:
             print(f"[Naver] Error ({investor}/{trade_type}): {e}")
+            return None
 
-    if not all_records:
-        return pd.DataFrame()
+    # 매수/매도 페이지는 요청+파싱을 각 스레드에서 동시에 (한쪽 파싱 중에도 다른 쪽 응답 수신)
+    #   결과는 map 순서(buy → sell)대로 모아 중복 종목은 buy 쪽 우선
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(trade_types)) as executor:
+        frames = [f for f in executor.map(_fetch_page, trade_types) if f is not None]
+
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if df.empty:
+        raise RuntimeError(f"네이버 매매상위 조회 실패 ({investor})")
 
-    df = pd.DataFrame(all_records)
     df = df.drop_duplicates(subset="종목코드", keep="first")
     df = df.set_index("종목코드")
     df = df.sort_values("순매수거래대금", ascending=False)
@@ -185,9 +245,21 @@ KRX_HEADERS = {
     "X-Requested-With": "XMLHttpRequest",
 }
 
+# KRX 요청도 공용 세션으로 (투자자/시장별 연속 호출 시 연결 재사용)
+_KRX_SESSION = _make_session(KRX_HEADERS)
+
 
 def fetch_krx_investor_net_purchases(date_str, market="KOSPI", investor="외국인"):
-    """KRX 직접 JSON API — 장중에는 빈 데이터 반환 가능 (18시 이후 확정)"""
+    """KRX 직접 JSON API — 장중에는 빈 데이터일 수 있음 (18시 이후 확정)
+
+    장중에는 60초, 장외에는 1시간 단위로 캐시. 조회 실패/빈 응답은 예외 (캐시하지 않음)
+    """
+    return _fetch_krx_investor_net_purchases(date_str, market, investor, _cache_bucket(60))
+
+
+@st.cache_data(ttl=_REALTIME_CACHE_TTL, max_entries=32, show_spinner=False)
+def _fetch_krx_investor_net_purchases(date_str, market, investor, bucket):
+    """fetch_krx_investor_net_purchases 본체 — bucket은 캐시 키 전용"""
     mkt_code = MARKET_CODE_MAP.get(market, "STK")
     inv_code = INVESTOR_CODE_MAP.get(investor, "9000")
 
@@ -200,32 +272,34 @@ def fetch_krx_investor_net_purchases(date_str, market="KOSPI", investor="외국
     }
 
     try:
-        resp = requests.post(KRX_API_URL, data=params, headers=KRX_HEADERS, timeout=10)
+        resp = _KRX_SESSION.post(KRX_API_URL, data=params, timeout=10)
         resp.raise_for_status()
-        data = resp.json()
-
-        if "output" not in data or not data["output"]:
-            return pd.DataFrame()
+        data = _json_loads(resp.content)
+    except Exception as e:
+        print(f"[KRX API] Error: {e}")
+        raise
 
-        df = pd.DataFrame(data["output"])
-        col_map = {
-            "ISU_SRT_CD": "종목코드", "ISU_ABBRV": "종목명",
-            "NETBID_TRDVAL": "순매수거래대금", "NETBID_TRDVOL": "순매수거래량",
-            "TDD_CLSPRC": "종가", "FLUC_RT": "등락률", "CMPPREVDD_PRC": "대비",
-        }
-        df = df.rename(columns={k: v for k, v in col_map.items() if k in df.columns})
+    if "output" not in data or not data["output"]:
+        raise RuntimeError(f"KRX 순매수 데이터 없음 ({date_str}/{market}/{investor})")
 
-        for col in ["순매수거래대금", "순매수거래량", "종가", "등락률", "대비"]:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col].astype(str).str.replace(",", ""), errors="coerce")
+    df = pd.DataFrame(data["output"])
+    col_map = {
+        "ISU_SRT_CD": "종목코드", "ISU_ABBRV": "종목명",
+        "NETBID_TRDVAL": "순매수거래대금", "NETBID_TRDVOL": "순매수거래량",
+        "TDD_CLSPRC": "종가", "FLUC_RT": "등락률", "CMPPREVDD_PRC": "대비",
+    }
+    df = df.rename(columns={k: v for k, v in col_map.items() if k in df.columns})
 
-        if "종목코드" in df.columns:
-            df = df.set_index("종목코드")
-        return df
+    # 숫자 컬럼 정리 (천 단위 콤마 제거 → 숫자) 후 한 번에 교체
+    present = [c for c in ["순매수거래대금", "순매수거래량", "종가", "등락률", "대비"] if c in df.columns]
+    df = df.assign(**{
+        c: pd.to_numeric(df[c].astype(str).str.replace(",", "", regex=False), errors="coerce")
+        for c in present
+    })
 
-    except Exception as e:
-        print(f"[KRX API] Error: {e}")
-        return pd.DataFrame()
+    if "종목코드" in df.columns:
+        df = df.set_index("종목코드")
+    return df
 
 
 # ═══════════════════════════════════════
@@ -3,7 +3,15 @@ Supabase 클라이언트 유틸리티
 - 환경변수 또는 Streamlit secrets에서 인증 정보를 가져옵니다.
 - Vercel/Streamlit Cloud 배포 시에도 동작합니다.
 """
+import io
 import os
+import json
+import base64
+import logging
+import time
+import threading
+from functools import wraps
+import numpy as np
 import streamlit as st
 
 # .env 파일 로드 (로컬 개발용)
@@ -13,15 +21,81 @@ try:
 except ImportError:
     pass
 
+try:
+    import orjson
+    _json_loads = orjson.loads  # 스윙 결과(수백 행 records JSON) 디코딩이 stdlib json보다 수 배 빠름
+except ImportError:
+    _json_loads = json.loads
+
+try:
+    import httpx
+    from supabase import create_client, Client, ClientOptions
+except ImportError:
+    create_client = None
+
+logger = logging.getLogger(__name__)
+
+# 화면 알림(st.error/st.warning) 최소 간격 — 장애 중 같은 경고가 연달아 렌더링되지 않도록
+_UI_NOTICE_INTERVAL = 5.0
+_UI_NOTICE_KEY = "_supabase_notice_ts"  # session_state: 메시지 → 마지막 표시 시각
+
+# 클라이언트 생성 실패 후 재시도까지 대기 (장애 중 매 rerun마다 재연결하지 않도록)
+_CLIENT_RETRY_INTERVAL = 60.0
+
+_client = None
+_client_failed_at = None  # 마지막 생성 실패 시각 (time.monotonic)
+_client_lock = threading.Lock()  # 여러 세션 스레드가 동시에 첫 호출해도 클라이언트는 하나만 생성
+
+
+def _notify(show, message):
+    """화면 알림은 세션별·메시지별로 _UI_NOTICE_INTERVAL초에 한 번만 표시하고, 생략된 알림은 logging으로 남김
+
+    세션 컨텍스트가 없는 스레드(예: 클라이언트 미리 생성)에서는 화면 대신 로그에만 남긴다.
+    """
+    try:
+        shown_at = st.session_state.setdefault(_UI_NOTICE_KEY, {})
+    except Exception:
+        logger.warning("[Supabase] %s", message)
+        return
+    now = time.monotonic()
+    if now - shown_at.get(message, float("-inf")) < _UI_NOTICE_INTERVAL:
+        logger.warning("[Supabase] (화면 알림 생략) %s", message)
+        return
+    shown_at[message] = now
+    print(f"[Supabase] {message}")
+    show(message)
+
+
 def get_supabase_client():
     """
     Supabase 클라이언트를 생성합니다.
     우선순위: Streamlit secrets > 환경변수 > None
+
+    프로세스당 한 번만 생성해 재사용. 생성에 실패하면 None을 반환하고 _CLIENT_RETRY_INTERVAL초 뒤
+    다시 시도한다. 인증 정보를 바꾼 뒤에는 reset_supabase_client()로 즉시 다시 생성.
     """
-    try:
-        from supabase import create_client, Client
-    except ImportError:
-        st.error("supabase 패키지가 설치되지 않았습니다. `pip install supabase` 를 실행해주세요.")
+    global _client, _client_failed_at
+    client = _client
+    if client is not None:
+        return client
+    with _client_lock:
+        if _client is None and (_client_failed_at is None
+                                or time.monotonic() - _client_failed_at >= _CLIENT_RETRY_INTERVAL):
+            _client = _create_supabase_client()
+            _client_failed_at = None if _client is not None else time.monotonic()
+        return _client
+
+
+def _make_http_client():
+    """PostgREST/Storage가 함께 쓰는 keep-alive 커넥션 풀 (요청마다 TLS 핸드셰이크 반복 방지)"""
+    limits = httpx.Limits(max_keepalive_connections=10, max_connections=20, keepalive_expiry=30)
+    transport = httpx.HTTPTransport(http2=True, retries=2, limits=limits)
+    return httpx.Client(transport=transport, timeout=10, follow_redirects=True)
+
+
+def _create_supabase_client():
+    if create_client is None:
+        _notify(st.error, "supabase 패키지가 설치되지 않았습니다. `pip install supabase` 를 실행해주세요.")
         return None
     
     # 1순위: Streamlit secrets (Streamlit Cloud / 배포 환경)
@@ -44,13 +118,21 @@ def get_supabase_client():
         return None
     
     try:
-        client: Client = create_client(url, key)
+        client: Client = create_client(url, key, options=ClientOptions(httpx_client=_make_http_client()))
         return client
     except Exception as e:
-        st.error(f"Supabase 연결 실패: {e}")
+        _notify(st.error, f"Supabase 연결 실패: {e}")
         return None
 
 
+def reset_supabase_client():
+    """캐시된 Supabase 클라이언트를 버림 — 다음 호출 시 인증 정보를 다시 읽어 새로 생성"""
+    global _client, _client_failed_at
+    with _client_lock:
+        _client = None
+        _client_failed_at = None
+
+
 def save_report(target_date: str, report_content: str) -> bool:
     """
     리포트를 Supabase에 저장합니다 (upsert).
@@ -71,134 +153,220 @@ def save_report(target_date: str, report_content: str) -> bool:
             data, 
             on_conflict="target_date,report_type"
         ).execute()
+        # 저장한 리포트가 바로 보이도록 조회 캐시 무효화
+        _fetch_report.clear()
+        _fetch_report_latest.clear()
         return True
     except Exception as e:
-        st.warning(f"Supabase 저장 실패 (로컬 파일에 저장됨): {e}")
+        _notify(st.warning, f"Supabase 저장 실패 (로컬 파일에 저장됨): {e}")
         return False
 
 
+def _swr_cache(soft_ttl, hard_ttl):
+    """stale-while-revalidate: soft_ttl이 지난 값은 바로 반환하고 백그라운드 스레드로 갱신,
+    hard_ttl이 지나면 직접 다시 조회 (폴링되는 조회가 만료 시점에 Supabase 왕복을 기다리지 않도록)"""
+    def decorator(func):
+        store = {}
+        refreshing = set()
+        lock = threading.Lock()
+        generation = [0]  # clear() 이전에 시작된 갱신 결과는 버림
+
+        def refresh(args, gen):
+            try:
+                value = func(*args)
+            except Exception:
+                return  # 갱신 실패 시 기존 값 유지 (다음 호출에서 다시 시도)
+            else:
+                with lock:
+                    if generation[0] == gen:
+                        store[args] = (time.monotonic(), value)
+            finally:
+                with lock:
+                    refreshing.discard(args)
+
+        @wraps(func)
+        def wrapper(*args):
+            with lock:
+                hit = store.get(args)
+                gen = generation[0]
+            if hit is not None:
+                age = time.monotonic() - hit[0]
+                if age < soft_ttl:
+                    return hit[1]
+                if age < hard_ttl:
+                    with lock:
+                        start = args not in refreshing
+                        refreshing.add(args)
+                    if start:
+                        threading.Thread(target=refresh, args=(args, gen), daemon=True).start()
+                    return hit[1]
+            value = func(*args)
+            with lock:
+                if generation[0] == gen:
+                    store[args] = (time.monotonic(), value)
+            return value
+
+        def clear():
+            with lock:
+                generation[0] += 1
+                store.clear()
+
+        wrapper.clear = clear
+        return wrapper
+    return decorator
+
+
+# 조회 캐시: 위젯 조작마다 재실행되는 rerun에서 같은 조회 반복 방지
+#   _fetch_*는 "행 없음"(None)만 반환값으로 캐시하고, 네트워크/인증 오류는 예외로 올려
+#   캐시에 남기지 않음 (일시 장애가 60초 동안 "리포트 없음"으로 굳지 않도록)
+@st.cache_data(ttl=60, max_entries=64, show_spinner=False)
+def _fetch_report(target_date: str) -> str | None:
+    client = get_supabase_client()
+    if not client:
+        return None
+
+    # 기준일 이하 중 가장 최근 날짜 1건 — 날짜 일치/이전 날짜 fallback을 한 번의 요청으로
+    result = client.table("reports").select("content, target_date").eq(
+        "report_type", "topdown"
+    ).lte(
+        "target_date", target_date
+    ).order(
+        "target_date", desc=True
+    ).order(
+        "created_at", desc=True
+    ).limit(1).execute()
+
+    if result.data:
+        return result.data[0]["content"]
+    return None
+
+
 def load_report(target_date: str) -> str | None:
     """
     Supabase에서 리포트를 조회합니다.
-    가장 최신 리포트를 반환합니다.
+    해당 날짜 리포트, 없으면 그 이전 가장 가까운 날짜의 리포트를 반환합니다.
+    (target_date는 'YYYYMMDD' 문자열이라 사전순 비교 = 날짜 비교)
     """
-    client = get_supabase_client()
-    if not client:
-        return None
-    
     try:
-        # 1. 특정 날짜 리포트 조회
-        result = client.table("reports").select("content, created_at").eq(
-            "target_date", target_date
-        ).eq(
-            "report_type", "topdown"
-        ).order(
-            "created_at", desc=True
-        ).limit(1).execute()
-        
-        if result.data and len(result.data) > 0:
-            return result.data[0]["content"]
-        
-        # 2. 없으면 가장 최신 리포트
-        result = client.table("reports").select("content, target_date, created_at").eq(
-            "report_type", "topdown"
-        ).order(
-            "created_at", desc=True
-        ).limit(1).execute()
-        
-        if result.data and len(result.data) > 0:
-            return result.data[0]["content"]
-        
-        return None
-    except Exception as e:
+        return _fetch_report(target_date)
+    except Exception:
         return None
 
 
+@_swr_cache(30, 300)  # 최신 리포트는 몇 분 지난 값이어도 충분 — 만료 시점에도 rerun이 조회를 기다리지 않음
+def _fetch_report_latest() -> tuple[str | None, str | None]:
+    client = get_supabase_client()
+    if not client:
+        return None, None
+
+    result = client.table("reports").select("content, target_date").eq(
+        "report_type", "topdown"
+    ).order(
+        "created_at", desc=True
+    ).limit(1).execute()
+
+    if result.data:
+        row = result.data[0]
+        return row["content"], row["target_date"]
+    return None, None
+
+
 def load_report_latest() -> tuple[str | None, str | None]:
     """
     가장 최신 리포트와 해당 날짜를 반환합니다.
     Returns: (content, target_date) 또는 (None, None)
     """
-    client = get_supabase_client()
-    if not client:
+    try:
+        return _fetch_report_latest()
+    except Exception:
         return None, None
 
-    try:
-        result = client.table("reports").select("content, target_date, created_at").eq(
-            "report_type", "topdown"
-        ).order(
-            "created_at", desc=True
-        ).limit(1).execute()
 
-        if result.data and len(result.data) > 0:
-            row = result.data[0]
-            return row["content"], row["target_date"]
-
-        return None, None
-    except Exception as e:
-        return None, None
+def _parse_tags(x):
+    """태그 셀 → 리스트 (JSON 문자열 / Parquet 배열 / 이미 리스트, 그 외 None·NaN은 빈 리스트)"""
+    if isinstance(x, str):
+        try:
+            return _json_loads(x)
+        except ValueError:  # 깨진 JSON
+            return []
+    if isinstance(x, np.ndarray):  # Parquet 리스트 컬럼
+        return x.tolist()
+    return x if isinstance(x, list) else []
 
 
 # ═══════════════════════════════════════
 # 스윙 분석 결과 조회 (GitHub Actions가 저장한 데이터)
 # ═══════════════════════════════════════
-def load_swing_results(target_date: str = None):
-    """
-    Supabase에서 스윙 분석 결과를 조회합니다.
-
-    Args:
-        target_date: 특정 날짜 (None이면 최신)
-
-    Returns:
-        (df_result, top_picks, source_date) 또는 (None, None, None)
-    """
-    import json
+@st.cache_data(ttl=60, max_entries=64, show_spinner=False)  # GitHub Actions 저장 주기(일 1회)에 비해 충분히 짧음
+def _fetch_swing_results(target_date: str = None):
     import pandas as pd
 
     client = get_supabase_client()
     if not client:
         return None, None, None
 
-    try:
-        query = client.table("analysis_results").select(
-            "results_json, top_picks_json, target_date, created_at"
-        ).eq("result_type", "swing")
+    query = client.table("analysis_results").select(
+        "results_json, top_picks_json, target_date"
+    ).eq("result_type", "swing")
 
-        if target_date:
-            query = query.eq("target_date", target_date)
+    if target_date:
+        query = query.eq("target_date", target_date)
 
-        result = query.order("created_at", desc=True).limit(1).execute()
+    result = query.order("created_at", desc=True).limit(1).execute()
 
-        if not result.data or len(result.data) == 0:
-            return None, None, None
+    if not result.data:
+        return None, None, None
 
-        row = result.data[0]
+    row = result.data[0]
 
-        # JSON → DataFrame 복원
-        df_result = pd.read_json(row["results_json"], orient='records')
+    # 결과 복원: base64 Parquet(현재 저장 형식) 또는 JSON records 문자열(예전 행)
+    payload = row["results_json"]
+    if payload.startswith("["):
+        # read_json과 달리 "005930" 같은 종목코드 문자열을 숫자로 바꾸지 않음
+        df_result = pd.DataFrame.from_records(_json_loads(payload))
+    else:
+        df_result = pd.read_parquet(io.BytesIO(base64.b64decode(payload)))
 
-        # 태그 복원 (JSON 문자열 → 리스트)
-        if '태그' in df_result.columns:
-            def parse_tags(x):
-                if isinstance(x, list):
-                    return x
-                try:
-                    return json.loads(x)
-                except:
-                    return []
-            df_result['태그'] = df_result['태그'].apply(parse_tags)
+    # 태그 복원 (JSON 문자열 / 배열 → 리스트)
+    if '태그' in df_result.columns:
+        df_result['태그'] = [_parse_tags(x) for x in df_result['태그'].to_numpy()]
 
-        top_picks = json.loads(row["top_picks_json"])
+    # JSONB 컬럼이면 PostgREST 응답에서 이미 리스트 (TEXT였던 예전 스키마는 JSON 문자열)
+    top_picks = row["top_picks_json"] or []
+    if isinstance(top_picks, str):
+        top_picks = _json_loads(top_picks)
 
-        # top_picks의 태그도 복원
-        for pick in top_picks:
-            if '태그' in pick and isinstance(pick['태그'], str):
-                try:
-                    pick['태그'] = json.loads(pick['태그'])
-                except:
-                    pick['태그'] = []
+    # top_picks의 태그도 복원
+    for pick in top_picks:
+        if '태그' in pick:
+            pick['태그'] = _parse_tags(pick['태그'])
 
-        return df_result, top_picks, row["target_date"]
+    return df_result, top_picks, row["target_date"]
 
-    except Exception as e:
+
+def load_swing_results(target_date: str = None):
+    """
+    Supabase에서 스윙 분석 결과를 조회합니다.
+
+    Args:
+        target_date: 특정 날짜 (None이면 최신)
+
+    Returns:
+        (df_result, top_picks, source_date) 또는 (None, None, None)
+    """
+    try:
+        return _fetch_swing_results(target_date)
+    except Exception:
         return None, None, None
+
+
+def clear_supabase_caches():
+    """st.cache_data.clear()가 닿지 않는 모듈 자체 캐시(_swr_cache)를 비움 — 앱의 캐시 초기화 버튼에서 함께 호출"""
+    _fetch_report_latest.clear()
+
+
+# 선택: import 시점에 백그라운드 스레드로 클라이언트를 미리 생성 (SUPABASE_PREWARM=1)
+#   첫 조회가 클라이언트 생성을 기다리지 않도록 — 동시에 호출돼도 싱글턴 락으로 하나만 생성
+#   (모든 함수가 정의된 뒤 시작해야 하므로 모듈 맨 끝에 둠)
+if os.environ.get("SUPABASE_PREWARM") == "1":
+    threading.Thread(target=get_supabase_client, daemon=True).start()